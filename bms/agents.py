@@ -1,138 +1,216 @@
 from __future__ import annotations
 """Agents for the Bookstore MAS (Mesa)."""
 import random
-from typing import List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 
 from mesa import Agent  # type: ignore[import-not-found]
 
-from bms.messaging import Message, MessageBus
-from bms.rules import run_reasoner
+from bms.messaging import Message
+from bms.sharding import settle_shard
 
 class CustomerAgent(Agent):
+    # SparseActivation draws which customers buy instead of stepping all of them
+    activation = "sampled"
+
     def __init__(self, unique_id, model, name: str, preferred_genres: Optional[List[str]] = None, buy_prob: float = 0.35):
         super().__init__(unique_id, model)
         self.name = name
         self.buy_prob = buy_prob
         self.preferred_genres = preferred_genres or []
 
+    @property
+    def activation_prob(self) -> float:
+        return self.buy_prob
+
     def step(self):
         # Customers randomly decide to buy based on probability
         if random.random() > self.buy_prob:
             return
+        self.act()
 
-        # Pick a book (bias by preference if possible)
+    def act(self):
+        """Place one order (the buy decision has already been made)."""
+        # Pick a book (bias by preference if possible) from the model's precomputed pools
         m: Any = self.model
-        book_list = list(getattr(m, "books", {}).values())
-        if not book_list:
+        book_pool = getattr(m, "book_pool", ())
+        if not book_pool:
             return
 
+        b = None
         if self.preferred_genres and random.random() < 0.7:
-            filtered = [b for b in book_list if (b.hasGenre and b.hasGenre in self.preferred_genres)]
-            candidates = filtered or book_list
+            b = self._pick_preferred(getattr(m, "genre_pools"))
+        if b is None:
+            b = book_pool[random.randrange(len(book_pool))]
+
+        # Build order OWL individual (or journal it for a later bulk flush)
+        journal = getattr(m, "journal", None)
+        if journal is not None:
+            order_iri = journal.record(self.unique_id, b, 1, getattr(m, "current_step", 0))
         else:
-            candidates = book_list
-        b = random.choice(candidates)
-
-        # Build order OWL individual
-        onto = getattr(m, "onto")
-        Order = onto.Order
-        orderedBy = onto.orderedBy
-        forBook = onto.forBook
-        quantity = onto.quantity
-
-        o = Order(iri = onto.base_iri + f"order_{self.unique_id}_{getattr(m, 'current_step', 0)}")
-        orderedBy[o] = [getattr(m, "customers")[self.unique_id].owl]  # point to OWL Customer
-        forBook[o] = [b]
-        quantity[o] = [1]
+            onto = getattr(m, "onto")
+            Order = onto.Order
+            orderedBy = onto.orderedBy
+            forBook = onto.forBook
+            quantity = onto.quantity
+
+            o = Order(iri = onto.base_iri + f"order_{self.unique_id}_{getattr(m, 'current_step', 0)}")
+            orderedBy[o] = [getattr(m, "customers")[self.unique_id].owl]  # point to OWL Customer
+            forBook[o] = [b]
+            quantity[o] = [1]
+            m.touch(o)
+            order_iri = o.iri
 
         # Emit message
-        m.bus.publish("purchase_request", Message(topic="purchase_request", sender=self.name, payload={
-            "order_iri": o.iri,
+        topic = m.router.topic(b)
+        m.bus.publish(topic, Message(topic=topic, sender=self.name, payload={
+            "order_iri": order_iri,
             "book_iri": b.iri,
             "qty": 1
         }))
 
+    def _pick_preferred(self, genre_pools: Dict[str, Tuple[Any, ...]]) -> Optional[Any]:
+        """Uniform pick over the union of the preferred genres' pools, without building a list."""
+        total = 0
+        for g in self.preferred_genres:
+            total += len(genre_pools.get(g, ()))
+        if not total:
+            return None
+        k = random.randrange(total)
+        for g in self.preferred_genres:
+            pool = genre_pools.get(g, ())
+            if k < len(pool):
+                return pool[k]
+            k -= len(pool)
+        return None
+
 class EmployeeAgent(Agent):
-    def __init__(self, unique_id, model, name: str):
+    def __init__(self, unique_id, model, name: str, settlement: str = "batch", topic: str = "purchase_request", shard: Optional[int] = None):
         super().__init__(unique_id, model)
         self.name = name
-        # Subscribe to bus topics
-        # We use polling in step() to avoid cross-thread complexity.
+        # 'batch': one settlement pass per step (see _settle_batch); 'per_message': one call per request
+        self.settlement = settlement
+        # Requests for this employee's inventory shard arrive on `topic` (see bms.sharding)
+        self.topic = topic
+        self.shard = shard
+        # Purchase requests are polled in step() so settlement stays on the scheduler thread;
+        # bus subscribers (any delivery mode) are meant for side work such as logging.
 
     def _process_purchase(self, m: Message):
         m_model: Any = self.model
-        onto = getattr(m_model, "onto")
-        # Resolve order + book
-        order = onto.world[ m.payload["order_iri"] ]
-        book = onto.world[ m.payload["book_iri"] ]
+        state = m_model.state
+        book_iri = m.payload["book_iri"]
         qty = m.payload.get("qty", 1)
 
-        # Find matching inventory
-        inv = None
-        for i in onto.Inventory.instances():
-            if onto.hasBook[i] and onto.hasBook[i][0] is book:
-                inv = i
-                break
+        # Find matching inventory (O(1) via the state backend's book index)
+        inv = state.lookup(book_iri)
         if inv is None:
-            getattr(m_model, "logs").append(f"[WARN] No inventory found for {book.name}")
+            getattr(m_model, "logs").append(f"[WARN] No inventory found for {state.book_name(book_iri)}")
             return
 
-        available = int(inv.availableQuantity)
+        available = state.quantity(inv)
         if available >= qty:
-            inv.availableQuantity = available - qty
-            m_model.total_sales = getattr(m_model, "total_sales", 0.0) + qty * float(book.hasPrice)
+            state.set_quantity(inv, available - qty)
+            m_model.total_sales = getattr(m_model, "total_sales", 0.0) + qty * state.price(book_iri)
             m_model.sold_count = getattr(m_model, "sold_count", 0) + qty
             m_model.bus.publish("purchase_result", Message(topic="purchase_result", sender=self.name, payload={
-                "status": "success", "book": book.name, "qty": qty, "remaining": int(inv.availableQuantity)
+                "status": "success", "book": state.book_name(book_iri), "qty": qty, "remaining": state.quantity(inv)
             }))
         else:
             m_model.stockouts = getattr(m_model, "stockouts", 0) + 1
             m_model.bus.publish("purchase_result", Message(topic="purchase_result", sender=self.name, payload={
-                "status": "stockout", "book": book.name, "qty": qty, "remaining": available
+                "status": "stockout", "book": state.book_name(book_iri), "qty": qty, "remaining": available
             }))
 
+    def _settle_batch(self, msgs: List[Message]):
+        """Settle all purchase requests drained this step with one quantity write per book.
+
+        Requests are grouped by book; within a group stock is allocated first come, first
+        served (arrival order), so the outcome is deterministic when demand exceeds supply.
+        All results go out as a single purchase_result message."""
+        plan = self._plan_batch(msgs)
+        self._apply_batch(plan, settle_shard(plan[1], plan[2]))
+
+    def _plan_batch(self, msgs: List[Message]) -> Tuple[List[Tuple[str, str, Any, List[Message]]], List[int], List[Tuple[int, int]]]:
+        """Group requests by book: (groups, starting stock per group, (group, qty) requests in
+        settlement order), as plain lists for settle_shard."""
+        m_model: Any = self.model
+        state = m_model.state
+        by_book: Dict[str, List[Message]] = {}
+        for msg in msgs:
+            by_book.setdefault(msg.payload["book_iri"], []).append(msg)
+
+        groups: List[Tuple[str, str, Any, List[Message]]] = []
+        stock: List[int] = []
+        requests: List[Tuple[int, int]] = []
+        for book_iri, group in by_book.items():
+            name = state.book_name(book_iri)
+            inv = state.lookup(book_iri)
+            if inv is None:
+                getattr(m_model, "logs").append(f"[WARN] No inventory found for {name}")
+                continue
+            i = len(groups)
+            groups.append((book_iri, name, inv, group))
+            stock.append(state.quantity(inv))
+            requests.extend((i, msg.payload.get("qty", 1)) for msg in group)
+        return groups, stock, requests
+
+    def _apply_batch(self, plan: Tuple[List[Tuple[str, str, Any, List[Message]]], List[int], List[Tuple[int, int]]],
+                     outcome: Tuple[List[int], List[int]]):
+        m_model: Any = self.model
+        state = m_model.state
+        groups, stock, _ = plan
+        final, after = outcome
+        results = []
+        r = 0
+        for i, (book_iri, name, inv, group) in enumerate(groups):
+            sold = 0
+            remaining = stock[i]
+            for msg in group:
+                qty = msg.payload.get("qty", 1)
+                if after[r] >= 0:
+                    remaining = after[r]
+                    sold += qty
+                    status = "success"
+                else:
+                    m_model.stockouts = getattr(m_model, "stockouts", 0) + 1
+                    status = "stockout"
+                r += 1
+                results.append({"status": status, "order_iri": msg.payload.get("order_iri"), "book": name, "qty": qty, "remaining": remaining})
+
+            if sold:
+                state.set_quantity(inv, final[i])
+                m_model.total_sales = getattr(m_model, "total_sales", 0.0) + sold * state.price(book_iri)
+                m_model.sold_count = getattr(m_model, "sold_count", 0) + sold
+
+        if results:
+            m_model.bus.publish("purchase_result", Message(topic="purchase_result", sender=self.name, payload={"results": results}))
+
     def _check_restock(self):
         m_model: Any = self.model
-        onto = getattr(m_model, "onto")
-        # Try to infer low-stock state via SWRL rules (falls back if reasoner unavailable)
-        run_reasoner(onto)
-
-        needs = []
-        for inv in onto.Inventory.instances():
-            needs_flag = getattr(inv, "needsRestock", None)
-            if isinstance(needs_flag, (list, tuple)):
-                needs_flag = needs_flag[0] if needs_flag else False
-            if needs_flag:
-                needs.append(inv)
-
-        # Fallback in case the reasoner could not run (e.g., Java missing)
-        if not needs:
-            for inv in onto.Inventory.instances():
-                available = int(inv.availableQuantity) if inv.availableQuantity else 0
-                threshold = int(inv.thresholdQuantity) if inv.thresholdQuantity else 5
-                if available < threshold:
-                    needs.append(inv)
+        state = m_model.state
+        # Only inventories whose quantity changed since the last check are re-evaluated
+        # (and, with several employees, only those of this employee's shard)
+        needs = state.due_restock(self.shard)
 
         for inv in needs:
             # Restock
-            current = int(inv.availableQuantity)
-            add = int(inv.restockAmount) if inv.restockAmount else 10
-            inv.availableQuantity = current + add
-            try:
-                inv.needsRestock = False
-            except Exception:
-                pass
+            add = state.restock_amount(inv)
+            state.set_quantity(inv, state.quantity(inv) + add)
+            state.clear_restock_flag(inv)
             m_model.restocks = getattr(m_model, "restocks", 0) + 1
             m_model.bus.publish("restock_done", Message(topic="restock_done", sender=self.name, payload={
-                "inv": inv.name, "added": add, "now": int(inv.availableQuantity)
+                "inv": state.inventory_name(inv), "added": add, "now": state.quantity(inv)
             }))
 
     def step(self):
         # Deliver bus messages (one per step)
         # Process all purchase requests
         m_model: Any = self.model
-        for msg in m_model.bus.drain("purchase_request"):
-            self._process_purchase(msg)
+        if self.settlement == "batch":
+            self._settle_batch(m_model.bus.drain(self.topic))
+        else:
+            for msg in m_model.bus.drain(self.topic):
+                self._process_purchase(msg)
 
         # After processing purchases, check restock conditions (SWRL-inferred)
         self._check_restock()
@@ -141,6 +219,7 @@ class EmployeeAgent(Agent):
 class BookAgent(Agent):
     """A lightweight agent holding a view of a Book + Inventory. It doesn't act actively in this model
     but provides a natural landing place for future behaviors (e.g., discounting, recommendations)."""
+    activation = "inert"  # never stepped by SparseActivation
     def __init__(self, unique_id, model, book_iri: str):
         super().__init__(unique_id, model)
         self.book_iri = book_iri
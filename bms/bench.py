@@ -0,0 +1,204 @@
+"""Scaling benchmarks for BMSModel.
+
+Runs a customers x books x steps matrix on synthetic catalogs (make_catalog: deterministic NDJSON
+seed files, loaded through the bulk loader) and reports, per cell:
+- init_s (model construction) and run_s / steps_per_sec (stepping only),
+- peak_rss_mb of the process (each cell runs in a fresh spawned process, so peaks don't leak
+  between cells),
+- exclusive time per phase (bms.metrics.PhaseTimer): customer_step (CustomerAgent step/act or
+  the vectorized population), employee_settlement, restock_check (including reasoner runs),
+  data_collection (DataCollector + results store) and other (scheduler, bus delivery, flushes).
+
+Phase timing adds two clock reads per timed call, which inflates customer_step for large
+agent populations; pass --no_phases for throughput numbers without it.
+
+    python -m bms.bench --customers 30 300 3000 --books 12 1000 10000 --steps 20 --out bench.json
+    python -m bms.bench ... --compare bench.json   # flag cells whose steps/sec dropped
+
+The output is one JSON document: {"meta": {...}, "cells": [...]}.
+
+`python -m bms.bench --import_budget` instead checks CLI startup: `import bms.run` must not load
+any of HEAVY_MODULES, and importing it / running `--help` must stay within a time budget.
+"""
+import json, multiprocessing, os, platform, random, subprocess, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List
+
+BENCH_VERSION = 1
+GENRES = ("Programming", "AI", "Sci-Fi", "Fantasy", "History", "Science", "Business", "Mystery",
+          "Romance", "Biography", "Poetry", "Travel")
+HEAVY_MODULES = ("matplotlib", "mesa", "pandas", "owlready2", "numpy")
+PHASES = ("customer_step", "employee_settlement", "restock_check", "data_collection", "other")
+
+def make_catalog(n_books: int, directory: str, seed: int = 0) -> str:
+    """Write (once) a synthetic NDJSON catalog of n_books rows and return its path."""
+    path = os.path.join(directory, f"catalog_{n_books}_{seed}.ndjson")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for i in range(n_books):
+            f.write(json.dumps({"title": f"Synthetic Book {i:07d}", "author": f"Author {rng.randrange(max(1, n_books // 3)):06d}",
+                                "genre": rng.choice(GENRES), "price": round(rng.uniform(5.0, 60.0), 2),
+                                "qty": rng.randint(5, 20)}) + "\n")
+    os.replace(tmp, path)
+    return path
+
+# bms.profiling phase names -> benchmark phases (unlisted methods count towards their caller)
+_BENCH_PHASE = {"model.step": "other", "schedule.step": "other",
+                "CustomerAgent.step": "customer_step", "CustomerAgent.act": "customer_step", "CustomerPopulation.step": "customer_step",
+                "EmployeeAgent.step": "employee_settlement",
+                "EmployeeAgent._check_restock": "restock_check",
+                "datacollector.collect": "data_collection", "results.record_model": "data_collection"}
+
+def instrument(model: Any) -> Any:
+    """Attach a PhaseTimer recording PHASES to `model` (instance methods only; classes untouched)."""
+    from bms.metrics import PhaseTimer
+    from bms.profiling import attach_phases
+    return attach_phases(model, PhaseTimer(), _BENCH_PHASE.get)
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024.0  # bytes on macOS, KiB elsewhere
+
+def run_cell(cell: Dict[str, Any]) -> Dict[str, Any]:
+    """Build and step one model (meant to run in its own process); return the cell's measurements."""
+    from bms.model import BMSModel
+    params = dict(cell.get("params", {}))
+    phases = cell.get("phases", True)
+    t = time.perf_counter()
+    m = BMSModel(seed_path=cell["seed_path"], N_customers=cell["customers"], seed=cell.get("seed", 42), **params)
+    init_s = time.perf_counter() - t
+    timer = instrument(m) if phases else None
+    try:
+        t = time.perf_counter()
+        for _ in range(cell["steps"]):
+            m.step()
+        run_s = time.perf_counter() - t
+    finally:
+        m.close()
+    return {"customers": cell["customers"], "books": cell["books"], "steps": cell["steps"], "params": params,
+            "init_s": init_s, "run_s": run_s, "steps_per_sec": cell["steps"] / run_s if run_s else 0.0,
+            "peak_rss_mb": _peak_rss_mb(),
+            "phases_ms": None if timer is None else {p: 1000.0 * timer.seconds.get(p, 0.0) for p in PHASES},
+            "sold_count": m.sold_count, "restocks": m.restocks, "stockouts": m.stockouts}
+
+def _meta() -> Dict[str, Any]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__),
+                             capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        rev = None
+    return {"bench_version": BENCH_VERSION, "git_rev": rev, "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def run_matrix(customers: Iterable[int], books: Iterable[int], steps: Iterable[int], workdir: str,
+               phases: bool = True, seed: int = 42, progress: Any = None, **params: Any) -> Dict[str, Any]:
+    """Run every cell of the matrix, one at a time, each in a fresh process. `params` are extra
+    BMSModel kwargs applied to every cell."""
+    cells = [{"customers": c, "books": b, "steps": s, "seed": seed, "phases": phases, "params": params,
+              "seed_path": make_catalog(b, workdir)}
+             for b in books for c in customers for s in steps]
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for cell in cells:  # sequential: concurrent cells would disturb each other's timings
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            row = pool.submit(run_cell, cell).result()
+        results.append(row)
+        if progress is not None:
+            progress(row)
+    return {"meta": _meta(), "cells": results}
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.10) -> List[Dict[str, Any]]:
+    """Cells (matched on customers/books/steps/params) whose steps/sec fell more than `tolerance`."""
+    key = lambda c: (c["customers"], c["books"], c["steps"], json.dumps(c["params"], sort_keys=True))
+    before = {key(c): c for c in baseline["cells"]}
+    regressions = []
+    for c in current["cells"]:
+        old = before.get(key(c))
+        if old and old["steps_per_sec"] and c["steps_per_sec"] < (1.0 - tolerance) * old["steps_per_sec"]:
+            regressions.append({"customers": c["customers"], "books": c["books"], "steps": c["steps"],
+                                "before": old["steps_per_sec"], "after": c["steps_per_sec"],
+                                "change": c["steps_per_sec"] / old["steps_per_sec"] - 1.0})
+    return regressions
+
+def _best_of(cmd: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def check_import_budget(budget_ms: float = 300.0, repeat: int = 5) -> Dict[str, Any]:
+    """Time `import bms.run` and `python -m bms.run --help` in fresh interpreters (best of
+    `repeat`, minus bare interpreter startup) and list heavy modules `import bms.run` pulled in.
+    Raises AssertionError when a heavy module is loaded or a budget is exceeded."""
+    py = sys.executable
+    probe = f"import sys, bms.run; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([py, "-c", probe], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    base = _best_of([py, "-c", "pass"], repeat)
+    result = {"heavy_modules": [m for m in loaded.split(",") if m],
+              "import_ms": max(0.0, 1000.0 * (_best_of([py, "-c", "import bms.run"], repeat) - base)),
+              "help_ms": max(0.0, 1000.0 * (_best_of([py, "-m", "bms.run", "--help"], repeat) - base)),
+              "budget_ms": budget_ms}
+    if result["heavy_modules"]:
+        raise AssertionError(f"import bms.run loaded heavy modules: {result['heavy_modules']}")
+    for k in ("import_ms", "help_ms"):
+        if result[k] > budget_ms:
+            raise AssertionError(f"{k} = {result[k]:.0f} ms exceeds the {budget_ms:.0f} ms budget")
+    return result
+
+if __name__ == "__main__":
+    import argparse, tempfile
+
+    parser = argparse.ArgumentParser(description="Benchmark BMSModel over a customers x books x steps matrix")
+    parser.add_argument("--customers", nargs="+", default=[30, 300, 3000], type=int)
+    parser.add_argument("--books", nargs="+", default=[12, 1000], type=int)
+    parser.add_argument("--steps", nargs="+", default=[20], type=int)
+    parser.add_argument("--seed", default=42, type=int)
+    parser.add_argument("--restock_mode", default="incremental", choices=["incremental", "reasoner", "validate"])
+    parser.add_argument("--reasoner", default="jvm", choices=["jvm", "native"])
+    parser.add_argument("--customer_mode", default="agents", choices=["agents", "vectorized"])
+    parser.add_argument("--scheduler", default="random", choices=["random", "sparse"])
+    parser.add_argument("--state_backend", default="owl", choices=["owl", "array"])
+    parser.add_argument("--order_mode", default="immediate", choices=["immediate", "journal"])
+    parser.add_argument("--no_phases", action="store_true", help="Skip per-phase timing (no instrumentation overhead)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "bms-bench"), help="Where synthetic catalogs are kept")
+    parser.add_argument("--out", default=None, help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier run; exit 1 on regressions")
+    parser.add_argument("--tolerance", default=0.10, type=float, help="Allowed steps/sec drop before a cell counts as a regression")
+    parser.add_argument("--import_budget", action="store_true", help="Only check CLI import/--help time and heavy imports (see check_import_budget)")
+    parser.add_argument("--budget_ms", default=300.0, type=float)
+    args = parser.parse_args()
+
+    if args.import_budget:
+        try:
+            print(json.dumps(check_import_budget(args.budget_ms), indent=2))
+        except AssertionError as e:
+            print(f"FAIL: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    report = lambda r: print(f"customers={r['customers']} books={r['books']} steps={r['steps']}: {r['steps_per_sec']:.1f} steps/s, "
+                             f"init {r['init_s']:.2f}s, peak RSS {r['peak_rss_mb']:.0f} MB", file=sys.stderr, flush=True)
+    result = run_matrix(args.customers, args.books, args.steps, args.workdir, phases=not args.no_phases, seed=args.seed, progress=report,
+                        restock_mode=args.restock_mode, reasoner=args.reasoner, customer_mode=args.customer_mode,
+                        scheduler=args.scheduler, state_backend=args.state_backend, order_mode=args.order_mode)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION customers={r['customers']} books={r['books']} steps={r['steps']}: "
+                  f"{r['before']:.1f} -> {r['after']:.1f} steps/s ({100 * r['change']:+.0f}%)", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
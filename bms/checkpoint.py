@@ -0,0 +1,160 @@
+"""Checkpoint / restore of a running BMSModel.
+
+A checkpoint is one gzip-compressed pickle holding:
+- the constructor parameters (model.params),
+- the Owlready2 quadstore as SQLite bytes (Connection.serialize),
+- everything else that evolves while stepping: metrics, stock counters, state backend arrays,
+  bus queues and stats, the order journal, the restock detector's dirty set, snapshot tracking,
+  the Python/NumPy RNG states, the activation order of the scheduler, the DataCollector
+  history and the results writer's position (its buffered rows are flushed first).
+
+restore_checkpoint rebuilds the model from its parameters (so the seed file, or the template
+cache, must still be there), swaps the quadstore in with Connection.deserialize and overwrites
+the dynamic state. Stepping a restored model produces exactly what the uninterrupted run would.
+Reasoner state (native engine snapshots) is rebuilt, not saved.
+
+Checkpoints are pickles: only load files you wrote yourself.
+"""
+import gzip, os, pickle, random
+from typing import Any, Dict
+
+from mesa.agent import AgentSet  # type: ignore[import-not-found]
+from owlready2 import Thing  # type: ignore[import-not-found]
+
+from bms import messaging, swrl
+
+CHECKPOINT_VERSION = 1
+# Entity attributes set by Owlready2 when the object is created; everything else is a lazily
+# loaded property value that may be stale after the quadstore is swapped
+_ENTITY_CORE = frozenset(("namespace", "_name", "_equivalent_to", "storid", "is_a"))
+
+def _rng_state(rng: Any) -> Any:
+    return None if rng is None else rng.bit_generator.state
+
+def capture(model: Any) -> Dict[str, Any]:
+    """Return the checkpoint payload of a model (see the module docstring)."""
+    model.bus.wait()
+    graph = model.onto.world.graph
+    graph.commit()
+    bus = model.bus
+    sched = model.schedule
+    journal = model.journal
+    dc = model.datacollector
+    state = {
+        "metrics": {k: getattr(model, k) for k in ("total_sales", "sold_count", "restocks", "stockouts", "logs", "current_step")},
+        "mesa": (model._steps, model._time, sched.steps, sched.time),
+        "catalog": ([(t, b.iri) for t, b in model.books.items()], [(t, i.iri) for t, i in model.inventories.items()]),
+        "stock": model.stock._qty,
+        "restock": ([inv.iri for inv in model.restock_detector._dirty], model.restock_detector.mismatches),
+        "snapshot": (model._snapshot_dirty, model._snapshot_full_needed, model._snapshot_seq),
+        "random": (random.getstate(), model.random.getstate(), _rng_state(model.population.rng if model.population else None)),
+        "conversation_id": messaging.peek_conversation_id(),
+        "bus": {"queues": {t: list(q) for t, q in bus._queues.items()}, "stats": bus._stats,
+                "dropped": bus.dropped, "rejected": bus.rejected, "current_step": bus.current_step},
+        "schedule": sched.get_state() if hasattr(sched, "get_state") else [a.unique_id for a in sched._agents],
+        "journal": None if journal is None else {
+            "pending": (journal.customer, journal.book, journal.qty, journal.step),
+            "materialized": journal._materialized, "purchases": journal._purchases,
+            "rolled_up_qty": journal.rolled_up_qty, "flushed": journal.flushed},
+        "datacollector": (dc.model_vars, dc._agent_records, dc.tables),
+        "reporter_calls": model.reporter_timing.calls,
+        "state_backend": model.state.get_state(),
+        "results": None if model.results is None else model.results.get_state(),
+    }
+    return {"version": CHECKPOINT_VERSION, "params": model.params, "db": graph.db.serialize(), "state": state}
+
+def save_checkpoint(model: Any, path: str) -> int:
+    """Write a checkpoint of `model` to `path`; returns the file size in bytes."""
+    payload = pickle.dumps(capture(model), protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        f.write(payload)
+    os.replace(tmp, path)  # a crash mid-write never leaves a truncated checkpoint behind
+    return os.path.getsize(path)
+
+def _swap_quadstore(onto: Any, data: bytes):
+    world = onto.world
+    world.graph.commit()
+    world.graph.db.deserialize(data)
+    for ent in list(world._entities.values()):
+        if not isinstance(ent, Thing):
+            continue  # classes and properties are identical in both stores
+        attrs = vars(ent)
+        for k in [k for k in attrs if k not in _ENTITY_CORE]:
+            attrs.pop(k, None)
+    swrl.drop_engine(onto)
+
+def restore(model: Any, payload: Dict[str, Any]):
+    """Overwrite a freshly constructed model (same params) with a checkpoint payload."""
+    if payload.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {payload.get('version')!r}; expected {CHECKPOINT_VERSION}")
+    st = payload["state"]
+    _swap_quadstore(model.onto, payload["db"])
+    world = model.onto.world
+
+    for k, v in st["metrics"].items():
+        setattr(model, k, v)
+    model._steps, model._time, model.schedule.steps, model.schedule.time = st["mesa"]
+
+    books, inventories = st["catalog"]
+    model.books = {t: world[iri] for t, iri in books}
+    model.inventories = {t: world[iri] for t, iri in inventories}
+    model.inventory_by_book = {b.iri: inv for inv in model.inventories.values() for b in inv.hasBook}
+    model._rebuild_pools()
+    model.stock._qty = st["stock"]
+    model.stock.units_in_stock = sum(st["stock"].values())
+    model.stock.books_in_stock = sum(1 for q in st["stock"].values() if q > 0)
+    dirty, model.restock_detector.mismatches = st["restock"]
+    model.restock_detector._dirty = {world[iri]: None for iri in dirty}
+    model._snapshot_dirty, model._snapshot_full_needed, model._snapshot_seq = st["snapshot"]
+
+    py_state, model_state, pop_state = st["random"]
+    random.setstate(py_state)
+    model.random.setstate(model_state)
+    if pop_state is not None:
+        model.population.rng.bit_generator.state = pop_state
+    messaging.set_conversation_id(st["conversation_id"])
+
+    bus = model.bus
+    b = st["bus"]
+    bus._queues.clear()
+    for topic, messages in b["queues"].items():
+        bus._queue(topic).extend(messages)
+    bus._stats, bus.dropped, bus.rejected, bus.current_step = b["stats"], b["dropped"], b["rejected"], b["current_step"]
+
+    sched = model.schedule
+    if hasattr(sched, "set_state"):
+        sched.set_state(st["schedule"])
+    else:
+        by_id = {a.unique_id: a for a in sched._agents}
+        sched._agents = AgentSet([by_id[uid] for uid in st["schedule"]], model)
+
+    j = st["journal"]
+    if j is not None:
+        journal = model.journal
+        journal.customer, journal.book, journal.qty, journal.step = j["pending"]
+        journal._materialized, journal._purchases = j["materialized"], j["purchases"]
+        journal.rolled_up_qty, journal.flushed = j["rolled_up_qty"], j["flushed"]
+
+    dc = model.datacollector
+    dc.model_vars, dc._agent_records, dc.tables = st["datacollector"]
+    model.reporter_timing.calls.update(st["reporter_calls"])
+    model.state.set_state(st["state_backend"])
+    if model.results is not None and st.get("results") is not None:
+        model.results.set_state(st["results"])
+
+    if model.rule_engine is not None:
+        model.rule_engine = swrl.native_engine(model.onto)  # fresh engine: the first run reads everything
+        model.rule_engine.track()
+
+def restore_checkpoint(path: str) -> Any:
+    """Rebuild the BMSModel saved in `path`, ready to keep stepping."""
+    from bms.model import BMSModel
+    with gzip.open(path, "rb") as f:
+        payload = pickle.loads(f.read())
+    params = dict(payload["params"])
+    if params.pop("settle_workers", 0):  # process-pool settlement was removed
+        raise ValueError(f"{path} was written with settle_workers, which is no longer supported")
+    model = BMSModel(**params)
+    restore(model, payload)
+    return model
@@ -1,21 +1,25 @@
-"""Predefined scenarios to collect results quickly."""
+"""Predefined scenarios to collect results quickly (replicated parameter studies: bms.sweep)."""
 import os
+from typing import Optional
+
 from .model import BMSModel
 
-def scenario_baseline(outdir: str):
-    m = BMSModel(seed_path=os.path.join(os.path.dirname(__file__), "data", "seed_books.json"), N_customers=30, restock_threshold=5, restock_amount=10, seed=42)
+SEED_PATH = os.path.join(os.path.dirname(__file__), "data", "seed_books.json")
+
+def scenario_baseline(outdir: str, template_cache: Optional[str] = None):
+    m = BMSModel(seed_path=SEED_PATH, N_customers=30, restock_threshold=5, restock_amount=10, seed=42, template_cache=template_cache)
     for _ in range(40):
         m.step()
     m.save_artifacts(os.path.join(outdir, "baseline"))
 
-def scenario_high_demand(outdir: str):
-    m = BMSModel(seed_path=os.path.join(os.path.dirname(__file__), "data", "seed_books.json"), N_customers=60, restock_threshold=5, restock_amount=10, seed=7)
+def scenario_high_demand(outdir: str, template_cache: Optional[str] = None):
+    m = BMSModel(seed_path=SEED_PATH, N_customers=60, restock_threshold=5, restock_amount=10, seed=7, template_cache=template_cache)
     for _ in range(40):
         m.step()
     m.save_artifacts(os.path.join(outdir, "high_demand"))
 
-def scenario_low_threshold(outdir: str):
-    m = BMSModel(seed_path=os.path.join(os.path.dirname(__file__), "data", "seed_books.json"), N_customers=30, restock_threshold=2, restock_amount=10, seed=99)
+def scenario_low_threshold(outdir: str, template_cache: Optional[str] = None):
+    m = BMSModel(seed_path=SEED_PATH, N_customers=30, restock_threshold=2, restock_amount=10, seed=99, template_cache=template_cache)
     for _ in range(40):
         m.step()
     m.save_artifacts(os.path.join(outdir, "low_threshold"))
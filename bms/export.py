@@ -0,0 +1,162 @@
+"""Streaming ontology export: N-Triples / Turtle, optional gzip, incremental deltas.
+
+Triples are read from the quadstore with a lazy SQL cursor (IRIs resolved by joins) and
+written as they arrive, so the document is never built in memory. RDF/XML still goes through
+Owlready2's own serializer (see bms.ontology.save_ontology).
+
+Delta snapshots list the subjects changed since the previous snapshot and their current
+triples. Each changed subject is announced by a comment line, which keeps the file valid
+N-Triples/Turtle:
+    # replace <http://example.org/bookstore.owl#inv_dune>
+A reader applies a delta by dropping every triple of the announced subjects and adding the
+triples that follow (a subject with no triples was deleted).
+"""
+import gzip, heapq, re
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Tuple
+
+FORMATS = ("rdfxml", "ntriples", "turtle")
+EXTENSIONS = {"rdfxml": ".owl", "ntriples": ".nt", "turtle": ".ttl"}
+
+_XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+PREFIXES = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+}
+_LOCAL_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_\-]*$")
+
+# (subject storid, subject term, predicate IRI, object term)
+Row = Tuple[int, str, str, str]
+
+_OBJ_SQL = """SELECT o.s, rs.iri, rp.iri, o.o, ro.iri FROM objs o
+  LEFT JOIN resources rs ON rs.storid = o.s
+  JOIN resources rp ON rp.storid = o.p
+  LEFT JOIN resources ro ON ro.storid = o.o
+  WHERE o.c = ?{where}{order}"""
+_DATA_SQL = """SELECT d.s, rs.iri, rp.iri, d.o, d.d, rd.iri FROM datas d
+  LEFT JOIN resources rs ON rs.storid = d.s
+  JOIN resources rp ON rp.storid = d.p
+  LEFT JOIN resources rd ON rd.storid = d.d
+  WHERE d.c = ?{where}{order}"""
+
+def open_output(path: str, compress: Optional[bool] = None) -> IO[str]:
+    """Text stream to `path`; gzip-compressed when compress is True (or path ends with .gz)."""
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8")  # type: ignore[return-value]
+    return open(path, "w", encoding="utf-8")
+
+def _node(storid: int, iri: Optional[str]) -> str:
+    return f"<{iri}>" if iri is not None else f"_:b{abs(storid)}"
+
+def _literal(value: Any, d: Any, datatype: Optional[str]) -> str:
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+    if isinstance(d, str) and d.startswith("@"):
+        return f'"{text}"{d}'
+    if datatype is None or datatype == _XSD_STRING:
+        return f'"{text}"'
+    return f'"{text}"^^<{datatype}>'
+
+def iter_triples(onto: Any, subject: Optional[int] = None, ordered: bool = False) -> Iterator[Row]:
+    """Stream the ontology's triples (optionally of one subject, optionally grouped by subject)."""
+    db = onto.world.graph.db
+    params: Tuple[Any, ...] = (onto.graph.c,) if subject is None else (onto.graph.c, subject)
+    where = "" if subject is None else " AND o.s = ?"
+    order = " ORDER BY o.s" if ordered else ""
+    objs = ((s, _node(s, s_iri), p, _node(o, o_iri)) for s, s_iri, p, o, o_iri in db.execute(_OBJ_SQL.format(where=where, order=order), params))
+    where = where.replace("o.s", "d.s")
+    order = order.replace("o.s", "d.s")
+    datas = ((s, _node(s, s_iri), p, _literal(o, d, dt)) for s, s_iri, p, o, d, dt in db.execute(_DATA_SQL.format(where=where, order=order), params))
+    if ordered:
+        yield from heapq.merge(objs, datas, key=lambda r: r[0])
+    else:
+        yield from objs
+        yield from datas
+
+def write_ntriples(out: IO[str], rows: Iterable[Row]):
+    write = out.write
+    for _s, s, p, o in rows:
+        write(f"{s} <{p}> {o} .\n")
+
+class TurtleWriter:
+    """Incremental Turtle serializer; consecutive triples of a subject are grouped with ';'."""
+    def __init__(self, out: IO[str], prefixes: Optional[Dict[str, str]] = None):
+        self.out = out
+        self.prefixes = dict(PREFIXES, **(prefixes or {}))
+        self._subject: Optional[str] = None
+        for name, iri in self.prefixes.items():
+            out.write(f"@prefix {name}: <{iri}> .\n")
+        out.write("\n")
+
+    def _term(self, term: str) -> str:
+        if not term.startswith("<"):
+            return term
+        if term == f"<{PREFIXES['rdf']}type>":
+            return "a"
+        iri = term[1:-1]
+        for name, ns in self.prefixes.items():
+            if iri.startswith(ns) and _LOCAL_NAME.match(iri[len(ns):]):
+                return f"{name}:{iri[len(ns):]}"
+        return term
+
+    def _object(self, term: str) -> str:
+        if term.startswith('"') and "^^<" in term:
+            lit, dt = term.rsplit("^^", 1)
+            return f"{lit}^^{self._term(dt)}"
+        return self._term(term) if term != f"<{PREFIXES['rdf']}type>" else term
+
+    def write(self, rows: Iterable[Row]):
+        out = self.out
+        for _s, s, p, o in rows:
+            pred = self._term(f"<{p}>")
+            if s == self._subject:
+                out.write(f" ;\n    {pred} {self._object(o)}")
+            else:
+                if self._subject is not None:
+                    out.write(" .\n")
+                out.write(f"{self._term(s)} {pred} {self._object(o)}")
+                self._subject = s
+
+    def close(self):
+        if self._subject is not None:
+            self.out.write(" .\n")
+            self._subject = None
+
+def export(onto: Any, path: str, format: str = "ntriples", compress: Optional[bool] = None):
+    """Stream the whole ontology to `path` as N-Triples or Turtle."""
+    with open_output(path, compress) as out:
+        if format == "ntriples":
+            write_ntriples(out, iter_triples(onto))
+        elif format == "turtle":
+            w = TurtleWriter(out, {"": onto.base_iri})
+            w.write(iter_triples(onto, ordered=True))
+            w.close()
+        else:
+            raise ValueError(f"Streaming export supports 'ntriples' or 'turtle', not {format!r}")
+
+def export_delta(onto: Any, path: str, subjects: Iterable[str], format: str = "ntriples", compress: Optional[bool] = None) -> int:
+    """Write the current triples of the given subjects (see module docstring). Returns the count."""
+    world = onto.world
+    n = 0
+    with open_output(path, compress) as out:
+        w = TurtleWriter(out, {"": onto.base_iri}) if format == "turtle" else None
+        if format not in ("ntriples", "turtle"):
+            raise ValueError(f"Delta export supports 'ntriples' or 'turtle', not {format!r}")
+        for iri in subjects:
+            if w is not None:
+                w.close()
+            out.write(f"# replace <{iri}>\n")
+            n += 1
+            storid = world._abbreviate(iri, create_if_missing=False)
+            if storid is None:
+                continue  # deleted subject
+            rows = iter_triples(onto, subject=storid)
+            if w is not None:
+                w.write(rows)
+            else:
+                write_ntriples(out, rows)
+        if w is not None:
+            w.close()
+    return n
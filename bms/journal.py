@@ -0,0 +1,120 @@
+"""Order journal: deferred, bulk materialization of OWL Order individuals.
+
+Purchases are recorded in compact parallel arrays (customer, book, qty, step) instead of
+creating an Owlready2 Order individual with three property assertions per purchase. The model
+flushes the journal at configurable points (every N steps, before reasoning, in
+save_artifacts); a flush writes all pending orders to the quadstore in one executemany batch
+per table.
+
+Optional rollup: orders older than `rollup_after` steps are kept only as aggregated
+purchases(customer, book) facts -- the same conclusion rule 2 derives -- and their Order
+individuals are removed (triples and resources rows), so the quadstore stops growing with the
+order history. `on_drop`, if set, is called with the storids of removed orders before their IRIs
+stop resolving.
+"""
+from array import array
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from owlready2 import rdf_type  # type: ignore[import-not-found]
+from owlready2.base import to_literal  # type: ignore[import-not-found]
+
+_NAMED_INDIVIDUAL = "http://www.w3.org/2002/07/owl#NamedIndividual"
+
+class OrderJournal:
+    def __init__(self, onto: Any, rollup_after: Optional[int] = None):
+        self.onto = onto
+        self.rollup_after = rollup_after
+        # Pending orders as parallel arrays; books are stored as storids
+        self.customer = array("q")
+        self.book = array("q")
+        self.qty = array("q")
+        self.step = array("q")
+        # Materialized orders still in the quadstore: (step, order storid, customer, book storid, qty)
+        self._materialized: Deque[Tuple[int, int, int, int, int]] = deque()
+        self._purchases: Set[Tuple[int, int]] = set()  # (customer storid, book storid) rolled up
+        self.rolled_up_qty: Dict[Tuple[int, int], int] = {}
+        self.flushed = 0
+        self.on_drop: Optional[Callable[[List[int]], None]] = None
+
+    def __len__(self) -> int:
+        return len(self.customer)
+
+    def order_iri(self, customer: int, step: int) -> str:
+        return self.onto.base_iri + f"order_{customer}_{step}"
+
+    def record(self, customer: int, book: Any, qty: int, step: int) -> str:
+        """Append one order and return the IRI it will be materialized under."""
+        self.customer.append(customer)
+        self.book.append(book.storid)
+        self.qty.append(qty)
+        self.step.append(step)
+        return self.order_iri(customer, step)
+
+    def flush(self, customers: Dict[int, Any], current_step: int) -> List[str]:
+        """Write pending orders (and roll up old ones). Returns the IRIs of changed subjects."""
+        onto = self.onto
+        world = onto.world
+        abbr = world._abbreviate
+        c = onto.graph.c
+        p_ordered, p_book, p_qty = onto.orderedBy.storid, onto.forBook.storid, onto.quantity.storid
+        order_cls, named = onto.Order.storid, abbr(_NAMED_INDIVIDUAL)
+        horizon = None if self.rollup_after is None else current_step - self.rollup_after
+
+        objs: List[Tuple[int, int, int, int]] = []
+        datas: List[Tuple[int, int, int, Any, Any]] = []
+        touched: List[str] = []
+        rollup: List[Tuple[int, int, int]] = []  # (customer, book storid, qty)
+        for cust, book, qty, step in zip(self.customer, self.book, self.qty, self.step):
+            if horizon is not None and step < horizon:
+                rollup.append((cust, book, qty))
+                continue
+            iri = self.order_iri(cust, step)
+            s = abbr(iri)
+            o, d = to_literal(qty)
+            objs.extend(((c, s, rdf_type, named), (c, s, rdf_type, order_cls),
+                         (c, s, p_ordered, customers[cust].owl.storid), (c, s, p_book, book)))
+            datas.append((c, s, p_qty, o, d))
+            self._materialized.append((step, s, cust, book, qty))
+            touched.append(iri)
+        self.flushed += len(self.customer)
+        self.customer, self.book, self.qty, self.step = array("q"), array("q"), array("q"), array("q")
+
+        # Old materialized orders are folded into purchases facts and removed
+        dropped: List[int] = []
+        while horizon is not None and self._materialized and self._materialized[0][0] < horizon:
+            _step, s, cust, book, qty = self._materialized.popleft()
+            dropped.append(s)
+            rollup.append((cust, book, qty))
+        if dropped:
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+            for s in dropped:
+                touched.append(world._unabbreviate(s))
+                world._entities.pop(s, None)  # forget cached Python objects of deleted orders
+            world.graph.db.executemany("DELETE FROM objs WHERE s=?", [(s,) for s in dropped])
+            world.graph.db.executemany("DELETE FROM datas WHERE s=?", [(s,) for s in dropped])
+            world.graph.db.executemany("DELETE FROM resources WHERE storid=?", [(s,) for s in dropped])
+
+        p_purchases = onto.purchases.storid
+        stale: Set[int] = set()
+        for cust, book, qty in rollup:
+            cs = customers[cust].owl.storid
+            key = (cs, book)
+            self.rolled_up_qty[key] = self.rolled_up_qty.get(key, 0) + qty
+            if key not in self._purchases and not world._has_obj_triple_spo(cs, p_purchases, book):
+                objs.append((c, cs, p_purchases, book))
+                stale.add(cs)
+            self._purchases.add(key)
+
+        if objs:
+            world.graph.db.executemany("INSERT INTO objs VALUES (?,?,?,?)", objs)
+        if datas:
+            world.graph.db.executemany("INSERT INTO datas VALUES (?,?,?,?,?)", datas)
+        for cs in stale:
+            # Loaded Customer objects cache their property values; reload purchases lazily
+            ent = world._entities.get(cs)
+            if ent is not None:
+                ent.__dict__.pop("purchases", None)
+            touched.append(world._unabbreviate(cs))
+        return touched
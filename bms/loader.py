@@ -0,0 +1,208 @@
+"""Streaming bulk catalog loader.
+
+`seed_from_json` reads the whole file and creates every Book/Inventory through Owlready2
+attribute assignments. For large catalogs this module instead:
+- streams rows from a JSON array, NDJSON (.ndjson/.jsonl) or CSV file with bounded memory,
+- writes the same triples straight into the quadstore, one executemany per table per batch,
+- reports throughput (rows/sec) after every batch.
+
+Rows need: title, author, genre, price, qty (same as seed_from_json). A title whose IRI
+already exists (in the world or earlier in the file) is skipped and counted in `skipped`.
+"""
+import csv, json, os, time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from owlready2 import rdf_type  # type: ignore[import-not-found]
+from owlready2.base import to_literal  # type: ignore[import-not-found]
+
+from bms.ontology import BASE_IRI, seed_from_json, slug
+
+_NAMED_INDIVIDUAL = "http://www.w3.org/2002/07/owl#NamedIndividual"
+
+@dataclass
+class LoadStats:
+    rows: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    # (title, book IRI, inventory IRI) of loaded rows, in file order (only if collected)
+    catalog: List[Tuple[str, str, str]] = field(default_factory=list, repr=False)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+# ---- row readers ------------------------------------------------------------------------------
+
+def _iter_json_array(f: Any, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield the elements of a top-level JSON array without loading the whole document."""
+    decoder = json.JSONDecoder()
+    buf, idx, eof = "", 0, False
+    in_array = False
+    while True:
+        # Skip separators, refilling the buffer as needed
+        while True:
+            while idx < len(buf) and buf[idx] in " \t\r\n,":
+                idx += 1
+            if idx < len(buf) or eof:
+                break
+            buf, idx = f.read(chunk_size), 0
+            eof = not buf
+        if idx >= len(buf):
+            if in_array:
+                raise ValueError("Unterminated JSON array")
+            return
+        if not in_array:
+            if buf[idx] != "[":
+                raise ValueError("Expected a JSON array of rows")
+            in_array = True
+            idx += 1
+            continue
+        if buf[idx] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, idx)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(chunk_size)
+            eof = not more
+            buf, idx = buf[idx:] + more, 0
+            continue
+        yield obj
+        idx = end
+        if idx > chunk_size:
+            buf, idx = buf[idx:], 0
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if ext == ".csv":
+        return "csv"
+    return "json"
+
+def iter_rows(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream catalog rows from a JSON array, NDJSON or CSV file."""
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8", newline="" if fmt == "csv" else None) as f:
+        if fmt == "json":
+            yield from _iter_json_array(f)
+        elif fmt == "ndjson":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            raise ValueError(f"Unknown catalog format {fmt!r}; expected 'json', 'ndjson' or 'csv'")
+
+# ---- bulk insertion ---------------------------------------------------------------------------
+
+def bulk_seed(onto: Any, path: str, default_threshold: int = 5, default_restock: int = 10, fmt: Optional[str] = None,
+              batch_size: int = 50_000, collect: bool = True, progress: Optional[Callable[[LoadStats], None]] = None) -> LoadStats:
+    """Insert Book + Inventory triples for every row of `path`, `batch_size` rows per batch."""
+    world = onto.world
+    graph = world.graph
+    db = graph.db
+    c = onto.graph.c
+    abbr = world._abbreviate
+    named, book_cls, inv_cls = abbr(_NAMED_INDIVIDUAL), onto.Book.storid, onto.Inventory.storid
+    p_author, p_genre, p_price = onto.hasAuthor.storid, onto.hasGenre.storid, onto.hasPrice.storid
+    p_avail, p_thresh, p_restock = onto.availableQuantity.storid, onto.thresholdQuantity.storid, onto.restockAmount.storid
+    p_needs, p_has_book = onto.needsRestock.storid, onto.hasBook.storid
+    thresh_lit, restock_lit, false_lit = to_literal(int(default_threshold)), to_literal(int(default_restock)), to_literal(False)
+
+    stats = LoadStats()
+    start = time.perf_counter()
+
+    def flush(batch: Dict[str, Dict[str, Any]]):
+        # Drop rows whose IRIs already exist in the world
+        keys = list(batch)
+        for i in range(0, len(keys), 500):
+            chunk = [BASE_IRI + f"book_{k}" for k in keys[i:i + 500]]
+            marks = ",".join("?" * len(chunk))
+            for (iri,) in db.execute(f"SELECT iri FROM resources WHERE iri IN ({marks})", chunk):
+                batch.pop(iri[len(BASE_IRI) + len("book_"):], None)
+                stats.skipped += 1
+        if not batch:
+            return
+        # Reserve a contiguous storid range: two resources (book, inventory) per row
+        n = 2 * len(batch)
+        last = db.execute("UPDATE store SET current_resource=current_resource+?", (n,)).execute("SELECT current_resource FROM store").fetchone()[0]
+        storid = last - n
+        resources: List[Tuple[int, str]] = []
+        objs: List[Tuple[int, int, int, int]] = []
+        datas: List[Tuple[Any, ...]] = []  # (c, s, p, value, datatype)
+        for key, row in batch.items():
+            b, inv = storid + 1, storid + 2
+            storid += 2
+            book_iri, inv_iri = BASE_IRI + f"book_{key}", BASE_IRI + f"inv_{key}"
+            resources.append((b, book_iri))
+            resources.append((inv, inv_iri))
+            objs.extend(((c, b, rdf_type, named), (c, b, rdf_type, book_cls),
+                         (c, inv, rdf_type, named), (c, inv, rdf_type, inv_cls), (c, inv, p_has_book, b)))
+            datas.extend(((c, b, p_author, *to_literal(row["author"])),
+                          (c, b, p_genre, *to_literal(row["genre"])),
+                          (c, b, p_price, *to_literal(float(row["price"]))),
+                          (c, inv, p_avail, *to_literal(int(row["qty"]))),
+                          (c, inv, p_thresh, *thresh_lit),
+                          (c, inv, p_restock, *restock_lit),
+                          (c, inv, p_needs, *false_lit)))
+            if collect:
+                stats.catalog.append((row["title"], book_iri, inv_iri))
+        db.executemany("INSERT INTO resources VALUES (?,?)", resources)
+        db.executemany("INSERT INTO objs VALUES (?,?,?,?)", objs)
+        db.executemany("INSERT INTO datas VALUES (?,?,?,?,?)", datas)
+        graph.commit()
+        stats.rows += len(batch)
+
+    batch: Dict[str, Dict[str, Any]] = {}
+    for row in iter_rows(path, fmt):
+        key = slug(row["title"])
+        if key in batch:
+            stats.skipped += 1
+            continue
+        batch[key] = row
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+            stats.seconds = time.perf_counter() - start
+            if progress is not None:
+                progress(stats)
+    flush(batch)
+    stats.seconds = time.perf_counter() - start
+    if progress is not None:
+        progress(stats)
+    return stats
+
+def seed_catalog(onto: Any, path: str, default_threshold: int = 5, default_restock: int = 10, bulk: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Seed the catalog and return (books, inventories) dicts keyed by title, like seed_from_json.
+    Every format is streamed through bulk_seed; bulk=False uses seed_from_json instead (JSON
+    arrays only; a repeated title then takes the last row's values, not the first)."""
+    if not bulk:
+        return seed_from_json(onto, path, default_threshold=default_threshold, default_restock=default_restock)
+    stats = bulk_seed(onto, path, default_threshold=default_threshold, default_restock=default_restock)
+    world = onto.world
+    books = {title: world[b] for title, b, _ in stats.catalog}
+    inventories = {title: world[i] for title, _, i in stats.catalog}
+    return books, inventories
+
+if __name__ == "__main__":
+    import argparse
+    from owlready2 import World  # type: ignore
+    from bms.ontology import build_ontology
+
+    parser = argparse.ArgumentParser(description="Bulk-load a catalog and report throughput")
+    parser.add_argument("path")
+    parser.add_argument("--format", default=None, choices=["json", "ndjson", "csv"])
+    parser.add_argument("--batch_size", default=50_000, type=int)
+    parser.add_argument("--out", default=None, help="Optional SQLite quadstore to write")
+    args = parser.parse_args()
+
+    world = World(filename=args.out) if args.out else World()
+    onto = build_ontology(world)
+    report = lambda s: print(f"{s.rows} rows ({s.skipped} skipped) in {s.seconds:.2f}s: {s.rows_per_sec:,.0f} rows/sec", flush=True)
+    bulk_seed(onto, args.path, fmt=args.format, batch_size=args.batch_size, collect=False, progress=report)
+    if args.out:
+        world.save()
@@ -2,42 +2,341 @@
 
 Topics used:
 - 'purchase_request'  : Customer -> Employee
-- 'purchase_result'   : Employee -> Customer
+- 'purchase_result'   : Employee -> Customer (batched settlement: one message per step, payload['results'])
 - 'restock_request'   : Employee (self-init) -> Employee
 - 'restock_done'      : Employee -> All
+
+Each topic is a FIFO deque, optionally bounded (`capacity`, per bus or per topic). When a
+bounded topic is full the overflow policy decides what a publish does:
+- 'block'       : wait until a consumer drains, up to `block_timeout` seconds (always finite),
+                  then raise BusFull. Only useful with publishers on other threads than the
+                  consumer: a thread that both publishes and drains (the model's stepping
+                  thread) can't unblock itself and gets BusFull after the timeout.
+- 'drop_oldest' : evict the oldest queued message (ring buffer).
+- 'reject'      : drop the new message; publish returns False.
+Dropped and rejected messages are counted per topic (`dropped`, `rejected`).
+
+Delivery modes (`delivery`), used by deliver() to run subscriber handlers:
+- 'sync'    : on the caller's thread, before deliver() returns.
+- 'thread'  : on a pool of `max_workers` single-thread lanes; deliver() returns at once.
+- 'asyncio' : on an event loop (the given `loop`, or one the bus runs in a daemon thread);
+              coroutine handlers are awaited. deliver() returns at once.
+Ordering: within a topic, handlers see messages in publish order and one message at a time, in
+every mode (a topic is pinned to one lane / serialized by a per-topic lock on the loop).
+Different topics may be handled concurrently, so there is no ordering across topics. Call
+wait() to block until everything handed out so far is handled (it re-raises the first handler
+error). publish/publish_many/drain/subscribe are safe from any thread.
+
+Instrumentation: every topic keeps publish/drain counts, the high-water queue depth and the
+publish-to-drain latency, in steps (of `bus.current_step`, which the model advances) and in
+wall time. stats() returns a snapshot as plain dicts.
 """
-from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List
-import uuid
+import asyncio, itertools, threading, time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "reject")
+DELIVERY_MODES = ("sync", "thread", "asyncio")
+
+_conversation_ids = itertools.count(1)
+
+def peek_conversation_id() -> int:
+    """Next counter-based conversation ID (for checkpoints); does not consume it."""
+    global _conversation_ids
+    n = next(_conversation_ids)
+    _conversation_ids = itertools.count(n)
+    return n
+
+def set_conversation_id(n: int):
+    global _conversation_ids
+    _conversation_ids = itertools.count(n)
+
+class BusFull(Exception):
+    """A 'block' topic stayed full for longer than block_timeout."""
 
-@dataclass
 class Message:
-    topic: str
-    sender: str
-    payload: dict
-    conversation_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    """One bus message. Conversation IDs come from a process-wide counter and are only
+    formatted as strings when read."""
+    __slots__ = ("topic", "sender", "payload", "_cid", "published_at", "published_step")
+
+    def __init__(self, topic: str, sender: str, payload: dict, conversation_id: Optional[str] = None):
+        self.topic = topic
+        self.sender = sender
+        self.payload = payload
+        self._cid: Any = next(_conversation_ids) if conversation_id is None else conversation_id
+        # Stamped by MessageBus on publish (perf_counter seconds, bus step)
+        self.published_at = 0.0
+        self.published_step = 0
+
+    @property
+    def conversation_id(self) -> str:
+        cid = self._cid
+        if not isinstance(cid, str):
+            cid = self._cid = f"conv-{cid}"
+        return cid
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (self.topic, self.sender, self.payload, self.conversation_id) == (other.topic, other.sender, other.payload, other.conversation_id)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Message(topic={self.topic!r}, sender={self.sender!r}, payload={self.payload!r}, conversation_id={self.conversation_id!r})"
+
+class TopicStats:
+    """Running counters of one topic (see MessageBus.stats)."""
+    __slots__ = ("published", "drained", "high_water", "latency_steps_sum", "latency_steps_max", "latency_wall_sum", "latency_wall_max")
 
-class MessageBus:
     def __init__(self):
+        self.published = 0
+        self.drained = 0
+        self.high_water = 0
+        self.latency_steps_sum = 0
+        self.latency_steps_max = 0
+        self.latency_wall_sum = 0.0
+        self.latency_wall_max = 0.0
+
+class MessageBus:
+    def __init__(self, capacity: Optional[int] = None, overflow: str = "reject", block_timeout: float = 1.0,
+                 delivery: str = "sync", max_workers: int = 4, loop: Optional[asyncio.AbstractEventLoop] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}; expected one of {OVERFLOW_POLICIES}")
+        if block_timeout is None or not 0 <= block_timeout < float("inf"):
+            raise ValueError(f"block_timeout must be a finite number of seconds >= 0, not {block_timeout!r}")
+        if delivery not in DELIVERY_MODES:
+            raise ValueError(f"Unknown delivery mode {delivery!r}; expected one of {DELIVERY_MODES}")
+        self.delivery = delivery
+        self.max_workers = max(1, max_workers)
+        self._lanes: List[ThreadPoolExecutor] = []
+        self._lane_of: Dict[str, ThreadPoolExecutor] = {}
+        self._loop = loop
+        self._loop_thread: Optional[threading.Thread] = None
+        self._topic_locks: Dict[str, asyncio.Lock] = {}
+        self._inflight: List[Future] = []
+        self._deliver_lock = threading.Lock()  # drain + hand-off is atomic, so batches keep their order
+        self.capacity = capacity
+        self.overflow = overflow
+        self.block_timeout = block_timeout
         self._subs: Dict[str, List[Callable[[Message], None]]] = {}
-        self._queues: Dict[str, List[Message]] = {}
+        self._queues: Dict[str, Deque[Message]] = {}
+        self._limits: Dict[str, tuple] = {}  # topic -> (capacity, overflow)
+        self._cond = threading.Condition()
+        self.dropped: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self._stats: Dict[str, TopicStats] = {}
+        self.current_step = 0
 
-    def publish(self, topic: str, message: Message):
-        self._queues.setdefault(topic, []).append(message)
+    def configure_topic(self, topic: str, capacity: Optional[int] = None, overflow: Optional[str] = None):
+        """Override the bus-wide capacity/overflow policy for one topic."""
+        overflow = overflow or self.overflow
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}; expected one of {OVERFLOW_POLICIES}")
+        with self._cond:
+            self._limits[topic] = (capacity, overflow)
+            old = self._queues.pop(topic, ())
+            self._queue(topic).extend(old)
 
-    def drain(self, topic: str) -> List[Message]:
-        q = self._queues.get(topic, [])
-        self._queues[topic] = []
+    def _queue(self, topic: str) -> Deque[Message]:
+        q = self._queues.get(topic)
+        if q is None:
+            capacity, overflow = self._limits.get(topic, (self.capacity, self.overflow))
+            # drop_oldest is exactly a deque with maxlen; the other policies check the length first
+            q = self._queues[topic] = deque(maxlen=capacity if overflow == "drop_oldest" else None)
+            if topic not in self._stats:
+                self._stats[topic] = TopicStats()
         return q
 
-    def subscribe(self, topic: str, handler: Callable[[Message], None]):
-        self._subs.setdefault(topic, []).append(handler)
+    def _put(self, topic: str, q: Deque[Message], message: Message) -> bool:
+        """Append under the lock, applying the topic's overflow policy."""
+        capacity, overflow = self._limits.get(topic, (self.capacity, self.overflow))
+        if capacity is not None and len(q) >= capacity:
+            if overflow == "drop_oldest":
+                self.dropped[topic] = self.dropped.get(topic, 0) + 1  # maxlen evicts the oldest on append
+            elif overflow == "reject":
+                self.rejected[topic] = self.rejected.get(topic, 0) + 1
+                return False
+            elif not self._cond.wait_for(lambda: len(q) < capacity, timeout=self.block_timeout):
+                raise BusFull(f"Topic {topic!r} full ({capacity} messages) for {self.block_timeout}s")
+        q.append(message)
+        st = self._stats[topic]
+        st.published += 1
+        if len(q) > st.high_water:
+            st.high_water = len(q)
+        return True
+
+    def publish(self, topic: str, message: Message) -> bool:
+        """Queue one message. Returns False if the topic's 'reject' policy dropped it."""
+        message.published_at = time.perf_counter()
+        message.published_step = self.current_step
+        with self._cond:
+            return self._put(topic, self._queue(topic), message)
+
+    def publish_many(self, topic: str, messages: Iterable[Message]) -> int:
+        """Queue messages in order under one lock acquisition. Returns how many were accepted."""
+        now, step = time.perf_counter(), self.current_step
+        messages = list(messages)
+        for m in messages:
+            m.published_at = now
+            m.published_step = step
+        with self._cond:
+            q = self._queue(topic)
+            capacity, _ = self._limits.get(topic, (self.capacity, self.overflow))
+            if capacity is None:
+                q.extend(messages)
+                st = self._stats[topic]
+                st.published += len(messages)
+                st.high_water = max(st.high_water, len(q))
+                return len(messages)
+            return sum(self._put(topic, q, m) for m in messages)
+
+    def drain(self, topic: str, max_n: Optional[int] = None) -> List[Message]:
+        """Remove and return the queued messages of a topic (at most max_n, oldest first)."""
+        with self._cond:
+            q = self._queues.get(topic)
+            if not q:
+                return []
+            if max_n is None or max_n >= len(q):
+                out = list(q)
+                q.clear()
+            else:
+                popleft = q.popleft
+                out = [popleft() for _ in range(max_n)]
+            self._cond.notify_all()
+            self._record_drain(self._stats[topic], out)
+            return out
+
+    def _record_drain(self, st: TopicStats, out: List[Message]):
+        now, step = time.perf_counter(), self.current_step
+        steps_sum = wall_sum = 0.0
+        steps_max, wall_max = st.latency_steps_max, st.latency_wall_max
+        for m in out:
+            ds, dw = step - m.published_step, now - m.published_at
+            steps_sum += ds
+            wall_sum += dw
+            if ds > steps_max:
+                steps_max = ds
+            if dw > wall_max:
+                wall_max = dw
+        st.drained += len(out)
+        st.latency_steps_sum += int(steps_sum)
+        st.latency_wall_sum += wall_sum
+        st.latency_steps_max, st.latency_wall_max = steps_max, wall_max
+
+    def stats(self, topic: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of per-topic counters: {topic: {published, drained, dropped, rejected, depth,
+        high_water, latency_steps_mean/max, latency_ms_mean/max}} (one topic if given)."""
+        with self._cond:
+            topics = [topic] if topic is not None else list(self._stats)
+            out: Dict[str, Dict[str, Any]] = {}
+            for t in topics:
+                st = self._stats.get(t) or TopicStats()
+                n = st.drained
+                out[t] = {
+                    "published": st.published,
+                    "drained": n,
+                    "dropped": self.dropped.get(t, 0),
+                    "rejected": self.rejected.get(t, 0),
+                    "depth": self.pending(t),
+                    "high_water": st.high_water,
+                    "latency_steps_mean": st.latency_steps_sum / n if n else 0.0,
+                    "latency_steps_max": st.latency_steps_max,
+                    "latency_ms_mean": 1000.0 * st.latency_wall_sum / n if n else 0.0,
+                    "latency_ms_max": 1000.0 * st.latency_wall_max,
+                }
+            return out
+
+    def pending(self, topic: str) -> int:
+        q = self._queues.get(topic)
+        return len(q) if q else 0
+
+    def subscribe(self, topic: str, handler: Callable[[Message], Any]):
+        with self._cond:
+            self._subs.setdefault(topic, []).append(handler)
 
     def deliver(self):
-        """Synchronous fan-out delivery to subscribers. Invoke once per step."""
-        for topic, subs in self._subs.items():
-            if not subs: continue
-            messages = self.drain(topic)
+        """Fan out queued messages to subscribers (see the module docstring). Invoke once per step."""
+        with self._cond:
+            subs_by_topic = [(topic, list(subs)) for topic, subs in self._subs.items() if subs]
+        with self._deliver_lock:
+            for topic, subs in subs_by_topic:
+                messages = self.drain(topic)
+                if not messages:
+                    continue
+                if self.delivery == "sync":
+                    self._handle(messages, subs)
+                elif self.delivery == "thread":
+                    self._track(self._lane(topic).submit(self._handle, messages, subs))
+                else:
+                    self._track(asyncio.run_coroutine_threadsafe(self._handle_async(topic, messages, subs), self._event_loop()))
+
+    @staticmethod
+    def _handle(messages: List[Message], subs: List[Callable[[Message], Any]]):
+        for m in messages:
+            for h in subs:
+                h(m)
+
+    async def _handle_async(self, topic: str, messages: List[Message], subs: List[Callable[[Message], Any]]):
+        lock = self._topic_locks.get(topic)
+        if lock is None:
+            lock = self._topic_locks[topic] = asyncio.Lock()
+        # Lock waiters are woken FIFO, so batches of a topic run in deliver() order
+        async with lock:
             for m in messages:
                 for h in subs:
-                    h(m)
+                    r = h(m)
+                    if asyncio.iscoroutine(r):
+                        await r
+
+    def _lane(self, topic: str) -> ThreadPoolExecutor:
+        with self._cond:
+            lane = self._lane_of.get(topic)
+            if lane is None:
+                # Topics are pinned round-robin to single-thread lanes: FIFO per topic
+                if len(self._lanes) < self.max_workers:
+                    self._lanes.append(ThreadPoolExecutor(max_workers=1, thread_name_prefix="bus-lane"))
+                lane = self._lane_of[topic] = self._lanes[len(self._lane_of) % self.max_workers]
+            return lane
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._cond:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="bus-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _track(self, fut: Future):
+        with self._cond:
+            self._inflight = [f for f in self._inflight if not f.done() or f.exception() is not None]
+            self._inflight.append(fut)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until all handlers handed out by deliver() have run; re-raise the first error."""
+        with self._cond:
+            inflight, self._inflight = self._inflight, []
+        done, not_done = wait_futures(inflight, timeout=timeout)
+        with self._cond:
+            self._inflight.extend(not_done)
+        for f in inflight:
+            if f in done and f.exception() is not None:
+                raise f.exception()  # type: ignore[misc]
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} bus deliveries still running after {timeout}s")
+
+    def close(self):
+        """Wait for in-flight deliveries, then stop the lanes / the bus-owned event loop."""
+        try:
+            self.wait()
+        finally:
+            for lane in self._lanes:
+                lane.shutdown(wait=True)
+            self._lanes, self._lane_of = [], {}
+            if self._loop_thread is not None and self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join()
+                self._loop.close()
+                self._loop, self._loop_thread = None, None
@@ -0,0 +1,104 @@
+"""Incrementally maintained model metrics and timed DataCollector reporters."""
+import threading, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+class InventoryCounters:
+    """Stock aggregates over the registered inventories, updated on every quantity write so
+    that reading them is O(1) (the model calls set/add/remove; nothing scans the catalog)."""
+    def __init__(self, inventories: Iterable[Any] = ()):
+        self._qty: Dict[str, int] = {}
+        self.books_in_stock = 0
+        self.units_in_stock = 0
+        for inv in inventories:
+            self.add(inv)
+
+    @staticmethod
+    def _read(inv: Any) -> int:
+        q = inv.availableQuantity
+        return int(q) if q else 0
+
+    def add(self, inv: Any, qty: Any = None):
+        self.set(inv, self._read(inv) if qty is None else int(qty))
+
+    def remove(self, inv: Any):
+        old = self._qty.pop(inv.iri, 0)
+        self.units_in_stock -= old
+        self.books_in_stock -= old > 0
+
+    def set(self, inv: Any, qty: int):
+        self.set_iri(inv.iri, qty)
+
+    def set_iri(self, iri: str, qty: int):
+        old = self._qty.get(iri, 0)
+        self._qty[iri] = qty
+        self.units_in_stock += qty - old
+        self.books_in_stock += (qty > 0) - (old > 0)
+
+    @property
+    def books_out_of_stock(self) -> int:
+        return len(self._qty) - self.books_in_stock
+
+class TimedReporters:
+    """Wraps model reporters so each call's wall time is accumulated per reporter name."""
+    def __init__(self, reporters: Dict[str, Callable[[Any], Any]]):
+        self.calls: Dict[str, int] = {name: 0 for name in reporters}
+        self.seconds: Dict[str, float] = {name: 0.0 for name in reporters}
+        self.reporters = {name: self._wrap(name, fn) for name, fn in reporters.items()}
+
+    def _wrap(self, name: str, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        calls, seconds, clock = self.calls, self.seconds, time.perf_counter
+        def timed(model: Any) -> Any:
+            t = clock()
+            try:
+                return fn(model)
+            finally:
+                seconds[name] += clock() - t
+                calls[name] += 1
+        return timed
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """{reporter: {calls, total_ms, mean_us}}, most expensive first."""
+        rows = {name: {"calls": self.calls[name], "total_ms": 1000.0 * s, "mean_us": 1e6 * s / self.calls[name] if self.calls[name] else 0.0}
+                for name, s in self.seconds.items()}
+        return dict(sorted(rows.items(), key=lambda kv: -kv[1]["total_ms"]))
+
+class PhaseTimer:
+    """Exclusive wall time per named phase. wrap() replaces a bound method on one object with a
+    timed version; time spent in a nested timed call is charged to the inner phase only, so the
+    phases add up to the time of the outermost calls. While `trace` is a list, every timed call
+    is also appended to it as (phase, start perf_counter, duration). Only calls on the thread
+    that created the timer are timed (e.g. not bus subscribers run by delivery threads)."""
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self.trace: Optional[List[Tuple[str, float, float]]] = None
+        self._children = [0.0]  # time spent in timed callees, per open call
+        self._thread = threading.get_ident()
+
+    def wrap(self, obj: Any, attr: str, phase: str):
+        fn = getattr(obj, attr)
+        calls, seconds, children, clock = self.calls, self.seconds, self._children, time.perf_counter
+        timer, owner, get_ident = self, self._thread, threading.get_ident
+        calls.setdefault(phase, 0)
+        seconds.setdefault(phase, 0.0)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            if get_ident() != owner:
+                return fn(*args, **kwargs)
+            children.append(0.0)
+            t = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - t
+                seconds[phase] += elapsed - children.pop()
+                children[-1] += elapsed
+                calls[phase] += 1
+                if timer.trace is not None:
+                    timer.trace.append((phase, t, elapsed))
+        setattr(obj, attr, timed)
+
+    def report(self, steps: int = 0) -> Dict[str, Dict[str, float]]:
+        """{phase: {calls, total_ms, per_step_ms}}, most expensive first."""
+        rows = {name: {"calls": self.calls[name], "total_ms": 1000.0 * s, "per_step_ms": 1000.0 * s / steps if steps else 0.0}
+                for name, s in self.seconds.items()}
+        return dict(sorted(rows.items(), key=lambda kv: -kv[1]["total_ms"]))
@@ -1,7 +1,10 @@
 from __future__ import annotations
 """Mesa model for the Bookstore MAS."""
 import random, os, json, pathlib
-from typing import Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np  # type: ignore
+from owlready2 import World  # type: ignore
 
 from mesa import Model  # type: ignore
 from mesa.time import RandomActivation  # type: ignore
@@ -10,47 +13,126 @@ from mesa.datacollection import DataCollector  # type: ignore
 from bms.messaging import MessageBus
 from bms import ontology as ontomod
 from bms import rules as rulesmod
+from bms import export
+from bms import loader
+from bms import template
+from bms import checkpoint
+from bms import results
+from bms import profiling
+from bms import swrl
 from bms.agents import CustomerAgent, EmployeeAgent, BookAgent, CustomerHandle
+from bms.population import CustomerPopulation
+from bms.journal import OrderJournal
+from bms.scheduler import SparseActivation
+from bms.sharding import ShardRouter
+from bms import state as statemod
+from bms.metrics import InventoryCounters, TimedReporters
 
 class BMSModel(Model):
-    def __init__(self, seed_path: str, N_customers: int = 30, restock_threshold: int = 5, restock_amount: int = 10, seed: int = 42):
+    def __init__(self, seed_path: str, N_customers: int = 30, restock_threshold: int = 5, restock_amount: int = 10, seed: int = 42, restock_mode: str = "incremental", reasoner: str = "jvm", settlement: str = "batch", customer_mode: str = "agents",
+                 order_mode: str = "immediate", flush_every: int = 0, rollup_after: Optional[int] = None,
+                 template_cache: Optional[str] = None, bus_capacity: Optional[int] = None, bus_overflow: str = "reject",
+                 bus_block_timeout: float = 1.0, bus_delivery: str = "sync", scheduler: str = "random", state_backend: str = "owl",
+                 n_employees: int = 1, shard_by: str = "hash",
+                 results_dir: Optional[str] = None, run_id: Optional[str] = None, record_inventory: bool = False):
+        self.params = {k: v for k, v in locals().items() if k not in ("self", "__class__")}  # for checkpoints
         super().__init__()
         random.seed(seed)
         self.random = random.Random(seed)
 
-        self.bus = MessageBus()
-        self.schedule = RandomActivation(self)
+        # Bounded per-topic queues keep memory flat under demand spikes (see bms.messaging)
+        # Subscribers run on the stepping thread ('sync') or overlap with the next step ('thread'/'asyncio')
+        self.bus = MessageBus(capacity=bus_capacity, overflow=bus_overflow, block_timeout=bus_block_timeout, delivery=bus_delivery)
+        # 'sparse' only activates agents that act this step (see bms.scheduler)
+        if scheduler not in ("random", "sparse"):
+            raise ValueError(f"Unknown scheduler {scheduler!r}; expected 'random' or 'sparse'")
+        self.schedule = RandomActivation(self) if scheduler == "random" else SparseActivation(self, seed=seed)
+
+        # Incremental snapshots (save_artifacts(incremental=True)): subjects changed since the last one
+        self._snapshot_dirty: Optional[Dict[str, None]] = None
+        self._snapshot_full_needed = False
+        self._snapshot_seq = 0
 
-        # Build ontology + data
-        self.onto = ontomod.build_ontology()
-        self.onto.base_iri = ontomod.BASE_IRI  # convenience
-        rulesmod.attach_rules(self.onto)
+        if template_cache:
+            # Ontology + seeded catalog cloned from a cached template (see bms.template)
+            self.onto, self.books, self.inventories = template.clone_template(seed_path, template_cache, default_threshold=restock_threshold, default_restock=restock_amount)
+            self.onto.base_iri = ontomod.BASE_IRI  # convenience
+        else:
+            # Build ontology + data in a private world
+            self.onto = ontomod.build_ontology(World())
+            self.onto.base_iri = ontomod.BASE_IRI  # convenience
+            rulesmod.attach_rules(self.onto)
 
-        # Seed books + inventory
-        self.books, self.inventories = ontomod.seed_from_json(self.onto, seed_path, default_threshold=restock_threshold, default_restock=restock_amount)
+            # Seed books + inventory (NDJSON/CSV catalogs are streamed in bulk, see bms.loader)
+            self.books, self.inventories = loader.seed_catalog(self.onto, seed_path, default_threshold=restock_threshold, default_restock=restock_amount)
+        # Book IRI -> Inventory individual, so purchases don't scan every inventory
+        self.inventory_by_book: Dict[str, Any] = {self.books[t].iri: inv for t, inv in self.inventories.items()}
+        # Candidate pools customers sample from: all books + per-genre tuples (see _rebuild_pools)
+        self.book_pool: Tuple[Any, ...] = ()
+        self.genre_pools: Dict[str, Tuple[Any, ...]] = {}
+        self.population: Optional[CustomerPopulation] = None
+        # Which employee (shard) owns each book, and the purchase topic it listens on
+        self.router = ShardRouter(n_employees, shard_by)
+        self._rebuild_pools()
+        # Rule 1 is re-evaluated only for inventories whose quantity changed
+        self.restock_detector = rulesmod.RestockDetector(self.onto, self.inventories.values(), mode=restock_mode, reasoner=reasoner,
+                                                         before_full_run=self.flush_orders, after_full_run=self._on_inferred)
+        # Orders: created as OWL individuals right away ('immediate') or journaled and flushed in bulk
+        if order_mode not in ("immediate", "journal"):
+            raise ValueError(f"Unknown order mode {order_mode!r}; expected 'immediate' or 'journal'")
+        if state_backend not in statemod.BACKENDS:
+            raise ValueError(f"Unknown state backend {state_backend!r}; expected one of {statemod.BACKENDS}")
+        if state_backend == "array":
+            if restock_mode != "incremental":
+                raise ValueError("state_backend='array' only supports restock_mode='incremental'")
+            order_mode = "journal"  # the array backend never writes OWL on the hot path
+        self.journal: Optional[OrderJournal] = OrderJournal(self.onto, rollup_after=rollup_after) if order_mode == "journal" else None
+        if self.journal is not None:
+            self.journal.on_drop = self._on_orders_dropped
+        self.flush_every = flush_every
 
         # Create Customers (OWL + agent)
+        if customer_mode not in ("agents", "vectorized"):
+            raise ValueError(f"Unknown customer mode {customer_mode!r}; expected 'agents' or 'vectorized'")
         self.customers: Dict[int, CustomerHandle] = {}
+        genres = sorted(self.genre_pools)
         for i in range(N_customers):
             c_owl = self.onto.Customer(iri = self.onto.base_iri + f"cust_{i}")
             self.customers[i] = CustomerHandle(c_owl)
+            if customer_mode == "vectorized":
+                continue
             # Prefer a random genre
-            genres = list({b.hasGenre for b in self.books.values() if b.hasGenre})
             prefs = self.random.sample(genres, k=min(2, len(genres))) if genres else []
             a = CustomerAgent(unique_id=i, model=self, name=f"Customer_{i}", preferred_genres=prefs)
             self.schedule.add(a)
+        if customer_mode == "vectorized":
+            # One array-backed agent for the whole population (uses the free unique_id N_customers)
+            self.population = CustomerPopulation(unique_id=N_customers, model=self, n=N_customers, genres=genres, rng=np.random.default_rng(seed))
+            self.schedule.add(self.population)
 
-        # Create 1 Employee (OWL + agent)
-        self.employee_owl = self.onto.Employee(iri = self.onto.base_iri + "employee_1")
-        emp = EmployeeAgent(unique_id=N_customers + 1, model=self, name="Employee_1")
-        self.schedule.add(emp)
+        # Create the Employees (OWL + agent), one per inventory shard
+        self.employees: List[EmployeeAgent] = []
+        for i in range(n_employees):
+            e_owl = self.onto.Employee(iri = self.onto.base_iri + f"employee_{i + 1}")
+            if i == 0:
+                self.employee_owl = e_owl
+            emp = EmployeeAgent(unique_id=N_customers + 1 + i, model=self, name=f"Employee_{i + 1}", settlement=settlement,
+                                topic=self.router.topics[i], shard=i if n_employees > 1 else None)
+            self.employees.append(emp)
+            self.schedule.add(emp)
 
         # Optional: Book agents as placeholders
-        uid = N_customers + 2
+        uid = N_customers + 1 + n_employees
         for b in self.books.values():
             self.schedule.add(BookAgent(unique_id=uid, model=self, book_iri=b.iri))
             uid += 1
 
+        # The native SWRL engine re-reads only touched subjects when full runs happen
+        self.rule_engine: Optional[swrl.RuleEngine] = None
+        if reasoner == "native" and restock_mode != "incremental":
+            self.rule_engine = swrl.native_engine(self.onto)
+            self.rule_engine.track()
+
         # Metrics
         self.total_sales = 0.0
         self.sold_count = 0
@@ -59,32 +141,232 @@ class BMSModel(Model):
         self.logs = []
         self.current_step = 0
 
-        self.datacollector = DataCollector(
-            model_reporters={
+        # Stock aggregates kept up to date by set_available_quantity / add_inventory / remove_inventory
+        self.stock = InventoryCounters(self.inventories.values())
+        # Inventory state read/written by settlement and restocking (see bms.state)
+        self.state = statemod.make_state(self, state_backend)
+
+        # Reporters are timed individually (see reporter_timings)
+        self.reporter_timing = TimedReporters({
                 "total_sales": lambda m: m.total_sales,
                 "sold_count": lambda m: m.sold_count,
                 "restocks": lambda m: m.restocks,
                 "stockouts": lambda m: m.stockouts,
-                "unique_books_in_stock": lambda m: sum(1 for inv in m.onto.Inventory.instances() if inv.availableQuantity and int(inv.availableQuantity) > 0),
-            }
-        )
+                "unique_books_in_stock": lambda m: m.stock.books_in_stock,
+                "units_in_stock": lambda m: m.stock.units_in_stock,
+                # Bus instrumentation over the purchase_request topic(s) (cumulative; see purchase_queue_stats)
+                "purchase_request_depth": lambda m: sum(m.bus.pending(t) for t in m.router.topics),
+                "purchase_request_high_water": lambda m: m.purchase_queue_stats()["high_water"],
+                "purchase_request_latency_steps": lambda m: m.purchase_queue_stats()["latency_steps_mean"],
+                "purchase_request_latency_ms": lambda m: m.purchase_queue_stats()["latency_ms_mean"],
+        })
+        self.datacollector = DataCollector(model_reporters=self.reporter_timing.reporters)
+        self.profiler: Optional[profiling.StepProfiler] = None  # see enable_profiling
+        # Optional columnar per-step results on disk (see bms.results)
+        self.run_id = run_id or results.default_run_id(self.params)
+        self.results: Optional[results.ResultsWriter] = None
+        if results_dir:
+            self.results = results.ResultsWriter(results_dir, self.run_id, params=self.params,
+                                                 inventories=list(self.inventories) if record_inventory else None)
+
+    def _rebuild_pools(self, genres: Optional[Iterable[str]] = None):
+        """(Re)build the candidate pools, optionally only for the given genres."""
+        books = tuple(self.books.values())
+        self.book_pool = books
+        if genres is None:
+            pools: Dict[str, List[Any]] = {}
+            for b in books:
+                if b.hasGenre:
+                    pools.setdefault(b.hasGenre, []).append(b)
+            self.genre_pools = {g: tuple(p) for g, p in pools.items()}
+        else:
+            for g in genres:
+                pool = tuple(b for b in books if b.hasGenre == g)
+                if pool:
+                    self.genre_pools[g] = pool
+                else:
+                    self.genre_pools.pop(g, None)
+        self.router.add_genres(self.genre_pools)
+        if self.population is not None:
+            self.population.sync_catalog()
+
+    def add_book(self, title: str, book: Any):
+        """Add a Book individual to the catalog and refresh the pools it belongs to."""
+        self.books[title] = book
+        self._rebuild_pools([book.hasGenre] if book.hasGenre else [])
+        self.touch(book)
+
+    def remove_book(self, title: str) -> Optional[Any]:
+        """Remove a Book individual from the catalog (the OWL individual itself is left untouched)."""
+        book = self.books.pop(title, None)
+        if book is not None:
+            self._rebuild_pools([book.hasGenre] if book.hasGenre else [])
+        return book
+
+    def add_inventory(self, title: str, inv: Any):
+        """Register an Inventory individual and index it by the IRI of its book."""
+        self.inventories[title] = inv
+        for b in inv.hasBook:
+            self.inventory_by_book[b.iri] = inv
+        self.restock_detector.mark(inv)
+        self.stock.add(inv)
+        self.state.register(inv)
+        self.touch(inv)
+
+    def remove_inventory(self, title: str) -> Optional[Any]:
+        """Unregister an Inventory individual (the OWL individual itself is left untouched)."""
+        inv = self.inventories.pop(title, None)
+        if inv is None:
+            return None
+        for b in inv.hasBook:
+            if self.inventory_by_book.get(b.iri) is inv:
+                del self.inventory_by_book[b.iri]
+        self.restock_detector.discard(inv)
+        self.stock.remove(inv)
+        self.state.unregister(inv)
+        return inv
+
+    def set_available_quantity(self, inv: Any, qty: int):
+        """Write availableQuantity and mark the inventory for the next restock check."""
+        inv.availableQuantity = qty
+        self.stock.set(inv, qty)
+        self.restock_detector.mark(inv)
+        self.touch(inv)
+
+    def flush_orders(self):
+        """Bring the ontology up to date: journaled orders, plus inventory values held by the
+        state backend (see bms.state)."""
+        self.state.project()
+
+    def touch(self, entity: Any):
+        """Record an entity (or IRI) whose triples changed, for the native rule engine and
+        incremental snapshots (each only if in use)."""
+        if self.rule_engine is not None:
+            self.rule_engine.touch(entity)
+        if self._snapshot_dirty is not None:
+            self._snapshot_dirty[entity if isinstance(entity, str) else entity.iri] = None
+
+    def _on_orders_dropped(self, storids: List[int]):
+        """Rolled-up orders are about to be deleted; the rule engine can't resolve their IRIs after."""
+        if self.rule_engine is not None:
+            self.rule_engine.forget(storids)
+
+    def _on_inferred(self, facts: Optional[List[Any]]):
+        """Track subjects changed by a full reasoner run (None: unknown, e.g. Pellet/HermiT)."""
+        if self._snapshot_dirty is None:
+            return
+        if facts is None:
+            self._snapshot_full_needed = True
+            return
+        for f in facts:
+            self.touch(f[0])
 
     def step(self):
         self.current_step += 1
+        self.bus.current_step = self.current_step
         self.datacollector.collect(self)
         self.schedule.step()
+        self.bus.deliver()
+        if self.results is not None:
+            self.results.record_model(self)  # after settlement, so the last step's outcome is kept
+        if self.flush_every and self.current_step % self.flush_every == 0:
+            self.flush_orders()
+
+    def purchase_queue_stats(self) -> Dict[str, Any]:
+        """MessageBus.stats combined over the shards' purchase topics (max high-water, latency
+        means weighted by drained messages)."""
+        per_topic = self.bus.stats()
+        rows = [per_topic[t] for t in self.router.topics if t in per_topic]
+        if len(rows) == 1:
+            return rows[0]
+        drained = sum(r["drained"] for r in rows)
+        return {
+            "published": sum(r["published"] for r in rows),
+            "drained": drained,
+            "dropped": sum(r["dropped"] for r in rows),
+            "rejected": sum(r["rejected"] for r in rows),
+            "depth": sum(r["depth"] for r in rows),
+            "high_water": max((r["high_water"] for r in rows), default=0),
+            "latency_steps_mean": sum(r["latency_steps_mean"] * r["drained"] for r in rows) / drained if drained else 0.0,
+            "latency_steps_max": max((r["latency_steps_max"] for r in rows), default=0),
+            "latency_ms_mean": sum(r["latency_ms_mean"] * r["drained"] for r in rows) / drained if drained else 0.0,
+            "latency_ms_max": max((r["latency_ms_max"] for r in rows), default=0.0),
+        }
+
+    def close(self):
+        """Flush results and stop background helpers (bus delivery threads). Safe to call
+        more than once."""
+        if self.results is not None:
+            self.results.close()
+        if self.profiler is not None:
+            self.profiler.finish()
+        self.bus.close()
+
+    def save_artifacts(self, outdir: str, format: str = "rdfxml", compress: bool = False, incremental: bool = False):
+        """Write the ontology snapshot + run summary.
 
-    def save_artifacts(self, outdir: str):
+        format: 'rdfxml', 'ntriples' or 'turtle' (the last two are streamed); compress gzips it.
+        incremental: the first call writes a full bookstore.NNNN.<ext>, later calls only
+        bookstore.NNNN.delta.<ext> with the subjects changed since (see bms.export)."""
         os.makedirs(outdir, exist_ok=True)
+        self.bus.wait()
+        self.flush_orders()
+        if self.results is not None:
+            self.results.flush()
         # Save ontology snapshot
-        ontopath = os.path.join(outdir, "bookstore.owl")
-        ontomod.save_ontology(self.onto, ontopath)
+        if format not in export.FORMATS:
+            raise ValueError(f"Unknown format {format!r}; expected one of {export.FORMATS}")
+        ext = export.EXTENSIONS[format] + (".gz" if compress else "")
+        if incremental:
+            self._save_incremental_snapshot(outdir, format, compress, ext)
+        else:
+            ontopath = os.path.join(outdir, "bookstore" + ext)
+            ontomod.save_ontology(self.onto, ontopath, format=format, compress=compress)
         # Save run summary
         summary = {
             "total_sales": self.total_sales,
             "sold_count": self.sold_count,
             "restocks": self.restocks,
             "stockouts": self.stockouts,
-            "steps": self.current_step
+            "steps": self.current_step,
+            "reporter_timings": self.reporter_timings(),
         }
-        json.dump(summary, open(os.path.join(outdir, "run_summary.json"), "w"), indent=2)
+        if self.profiler is not None:
+            summary["phase_timings"] = self.profiler.phases()
+        with open(os.path.join(outdir, "run_summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+    def checkpoint(self, path: str) -> int:
+        """Save the full model state to one compressed file (see bms.checkpoint); returns its size."""
+        return checkpoint.save_checkpoint(self, path)
+
+    @classmethod
+    def restore(cls, path: str) -> "BMSModel":
+        """Rebuild a model from a checkpoint; stepping it continues the saved run exactly."""
+        return checkpoint.restore_checkpoint(path)
+
+    def enable_profiling(self, steps: Optional[Tuple[Optional[int], Optional[int]]] = None,
+                         cprofile_path: Optional[str] = None, trace_path: Optional[str] = None) -> profiling.StepProfiler:
+        """Time every phase of step() from now on (profiler.phases()); for steps first..last
+        (`steps`, inclusive) also dump cProfile stats and/or a Chrome trace (see bms.profiling)."""
+        if self.profiler is None:
+            self.profiler = profiling.StepProfiler(self, steps, cprofile_path, trace_path)
+        return self.profiler
+
+    def reporter_timings(self) -> Dict[str, Dict[str, float]]:
+        """Per-reporter DataCollector cost so far: {name: {calls, total_ms, mean_us}}, most expensive first."""
+        return self.reporter_timing.report()
+
+    def _save_incremental_snapshot(self, outdir: str, format: str, compress: bool, ext: str) -> str:
+        if format == "rdfxml":
+            raise ValueError("Incremental snapshots need format='ntriples' or 'turtle'")
+        if self._snapshot_dirty is None or self._snapshot_full_needed:
+            path = os.path.join(outdir, f"bookstore.{self._snapshot_seq:04d}{ext}")
+            export.export(self.onto, path, format=format, compress=compress)
+        else:
+            path = os.path.join(outdir, f"bookstore.{self._snapshot_seq:04d}.delta{ext}")
+            export.export_delta(self.onto, path, list(self._snapshot_dirty), format=format, compress=compress)
+        self._snapshot_dirty = {}
+        self._snapshot_full_needed = False
+        self._snapshot_seq += 1
+        return path
@@ -7,20 +7,24 @@
 This module exposes helpers to build the ontology and seed sample data.
 """
 
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 from owlready2 import (  # type: ignore[import-not-found]
-    get_ontology,
+    default_world,
     Thing,
     ObjectProperty,
     DataProperty,
     FunctionalProperty,
 )
-import os, json
+import os, json, gzip
+
+from bms import export
 
 BASE_IRI = "http://example.org/bookstore.owl#"
 
-def build_ontology() -> Any:
-    onto = get_ontology(BASE_IRI)
+def build_ontology(world: Optional[Any] = None) -> Any:
+    """Declare the classes and properties in `world` (Owlready2's default world if None).
+    Give each model its own World: the IRIs are fixed, so two models can't share one."""
+    onto = (world or default_world).get_ontology(BASE_IRI)
     with onto:
         class Book(Thing):
             pass
@@ -93,8 +97,10 @@ def seed_from_json(onto: Any, path: str, default_threshold: int = 5, default_res
     """Create Book + Inventory individuals from a JSON file.
     JSON rows must have: title, author, genre, price, qty
     Returns: dicts of created individuals.
+    BMSModel seeds through bms.loader.seed_catalog, which streams rows instead (bulk_seed).
     """
-    data = json.load(open(path, "r", encoding="utf-8"))
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
     Book = onto.Book
     Inventory = onto.Inventory
     hasAuthor = onto.hasAuthor
@@ -128,6 +134,14 @@ def seed_from_json(onto: Any, path: str, default_threshold: int = 5, default_res
 def slug(s: str) -> str:
     return ''.join(c.lower() if c.isalnum() else '_' for c in s).strip('_')
 
-def save_ontology(onto: Any, out_file: str):
-    os.makedirs(os.path.dirname(out_file), exist_ok=True)
-    onto.save(file=out_file, format="rdfxml")
+def save_ontology(onto: Any, out_file: str, format: str = "rdfxml", compress: bool = False):
+    """Save the ontology as RDF/XML (Owlready2 serializer) or stream it as N-Triples/Turtle
+    (see bms.export); compress=True gzips the output."""
+    os.makedirs(os.path.dirname(out_file) or ".", exist_ok=True)
+    if format != "rdfxml":
+        export.export(onto, out_file, format=format, compress=compress)
+    elif compress:
+        with gzip.open(out_file, "wb") as f:
+            onto.save(file=f, format="rdfxml")
+    else:
+        onto.save(file=out_file, format="rdfxml")
@@ -0,0 +1,117 @@
+"""Array-backed customer population (vectorized alternative to one CustomerAgent per customer).
+
+A single CustomerPopulation agent holds buy probabilities, genre preferences and the catalog
+index in NumPy arrays. One step draws every buy decision and book pick with a seeded
+numpy.random.Generator in a handful of vectorized calls, then emits the purchase requests in
+bulk. Behaviour mirrors CustomerAgent: buy with probability buy_prob, then with probability
+pref_prob pick uniformly among the preferred genres' books, otherwise among all books.
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np  # type: ignore[import-not-found]
+from mesa import Agent  # type: ignore[import-not-found]
+
+from bms.messaging import Message
+
+class CustomerPopulation(Agent):
+    def __init__(self, unique_id, model, n: int, genres: Sequence[str], rng: np.random.Generator,
+                 buy_prob: float = 0.35, pref_prob: float = 0.7, k_prefs: int = 2):
+        super().__init__(unique_id, model)
+        self.n = n
+        self.rng = rng
+        self.pref_prob = pref_prob
+        self.buy_prob = np.full(n, buy_prob, dtype=np.float64)
+        self.genres: List[str] = list(genres)
+
+        # Preferred genres as indices into self.genres: k distinct genres per customer
+        n_genres = len(self.genres)
+        k = min(k_prefs, n_genres)
+        prefs = np.empty((n, k), dtype=np.int64)
+        if k:
+            prefs[:, 0] = rng.integers(n_genres, size=n)
+            for j in range(1, k):
+                # Rejection-free distinct draws: shift past the genres already taken
+                col = rng.integers(n_genres - j, size=n)
+                for prev in np.sort(prefs[:, :j], axis=1).T:
+                    col += col >= prev
+                prefs[:, j] = col
+        self.prefs = prefs
+        self.sync_catalog()
+
+    def preferred_genres(self, i: int) -> List[str]:
+        return [self.genres[g] for g in self.prefs[i]]
+
+    def sync_catalog(self):
+        """Rebuild the catalog index arrays from the model's book/genre pools."""
+        m: Any = self.model
+        self.book_pool = m.book_pool
+        pos = {b: i for i, b in enumerate(self.book_pool)}
+        pools = [m.genre_pools.get(g, ()) for g in self.genres]
+        self.genre_size = np.array([len(p) for p in pools], dtype=np.int64)
+        self.genre_start = np.concatenate(([0], np.cumsum(self.genre_size)[:-1])).astype(np.int64) if pools else np.zeros(0, dtype=np.int64)
+        self.genre_books = np.array([pos[b] for p in pools for b in p], dtype=np.int64)
+
+    def draw(self) -> "tuple[np.ndarray, np.ndarray]":
+        """Return (customer ids, book indices into book_pool) of this step's purchases."""
+        rng = self.rng
+        n_books = len(self.book_pool)
+        buyers = np.flatnonzero(rng.random(self.n) < self.buy_prob)
+        if not buyers.size or not n_books:
+            return buyers[:0], buyers[:0]
+
+        picks = rng.integers(n_books, size=buyers.size)
+        if self.prefs.shape[1]:
+            use_pref = rng.random(buyers.size) < self.pref_prob
+            g = self.prefs[buyers[use_pref]]
+            sizes = self.genre_size[g]
+            total = sizes.sum(axis=1)
+            cum = sizes.cumsum(axis=1)
+            r = np.floor(rng.random(g.shape[0]) * total).astype(np.int64)
+            rows = np.arange(g.shape[0])
+            j = np.minimum((r[:, None] >= cum).sum(axis=1), g.shape[1] - 1)
+            gi = g[rows, j]
+            off = r - (cum[rows, j] - sizes[rows, j])
+            # Customers whose preferred genres are empty fall back to the uniform pick
+            has_books = total > 0
+            pref_picks = picks[use_pref]
+            pref_picks[has_books] = self.genre_books[self.genre_start[gi[has_books]] + off[has_books]]
+            picks[use_pref] = pref_picks
+        return buyers, picks
+
+    def step(self):
+        m: Any = self.model
+        buyers, picks = self.draw()
+        if not buyers.size:
+            return
+
+        onto = m.onto
+        Order = onto.Order
+        orderedBy = onto.orderedBy
+        forBook = onto.forBook
+        quantity = onto.quantity
+        customers = m.customers
+        journal = getattr(m, "journal", None)
+        step = getattr(m, "current_step", 0)
+        book_pool = self.book_pool
+        sender = "Customer_"
+        topic = m.router.topic
+        by_topic: Dict[str, List[Message]] = {}
+        for cid, bi in zip(buyers.tolist(), picks.tolist()):
+            b = book_pool[bi]
+            if journal is not None:
+                order_iri = journal.record(cid, b, 1, step)
+            else:
+                o = Order(iri = onto.base_iri + f"order_{cid}_{step}")
+                orderedBy[o] = [customers[cid].owl]
+                forBook[o] = [b]
+                quantity[o] = [1]
+                m.touch(o)
+                order_iri = o.iri
+            t = topic(b)
+            by_topic.setdefault(t, []).append(Message(t, sender + str(cid), {
+                "order_iri": order_iri,
+                "book_iri": b.iri,
+                "qty": 1
+            }))
+        for t, messages in by_topic.items():
+            m.bus.publish_many(t, messages)
@@ -0,0 +1,122 @@
+"""Per-phase timing and profiling of BMSModel.step.
+
+attach_phases() wraps, on one model instance, the methods that make up a step (nothing is
+patched at class level) with a bms.metrics.PhaseTimer. Phases (exclusive time, see PhaseTimer):
+- model.step               what is left of step(): bookkeeping, journal flushes
+- schedule.step            scheduler overhead (shuffling, activation sampling)
+- <AgentType>.step / .act  each agent type's own work, e.g. CustomerAgent.act, EmployeeAgent.step
+- EmployeeAgent._check_restock
+- run_reasoner             full reasoner runs of the restock detector
+- bus.publish, bus.publish_many, bus.drain, bus.deliver
+- datacollector.collect, results.record_model
+Agents added after profiling starts (add_book) are not timed.
+
+StepProfiler (BMSModel.enable_profiling, `python -m bms.run --profile`) keeps the phase timer
+running and, for a range of steps, can also run cProfile (dump_stats file, read with pstats or
+snakeviz) and record a Chrome trace (JSON for chrome://tracing or ui.perfetto.dev, one complete
+event per timed call, nested as called). Both files are written when the range ends or on
+finish().
+"""
+import cProfile, json, os, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bms.metrics import PhaseTimer
+
+def attach_phases(model: Any, timer: PhaseTimer, phase_of: Optional[Callable[[str], Optional[str]]] = None) -> PhaseTimer:
+    """Time `model`'s step phases with `timer`. `phase_of` maps the phase names above to the
+    names to record (None: leave that method untimed, so it counts towards its caller)."""
+    def wrap(obj: Any, attr: str, name: str):
+        phase = phase_of(name) if phase_of is not None else name
+        if phase is not None and obj is not None:
+            timer.wrap(obj, attr, phase)
+
+    wrap(model, "step", "model.step")
+    wrap(model.schedule, "step", "schedule.step")
+    wrap(model.datacollector, "collect", "datacollector.collect")
+    wrap(model.results, "record_model", "results.record_model")
+    wrap(model.restock_detector, "_full_scan", "run_reasoner")
+    for attr in ("publish", "publish_many", "drain", "deliver"):
+        wrap(model.bus, attr, f"bus.{attr}")
+    for agent in list(model.schedule.agents):
+        kind = type(agent).__name__
+        wrap(agent, "step", f"{kind}.step")
+        if hasattr(agent, "act"):
+            wrap(agent, "act", f"{kind}.act")
+        if hasattr(agent, "_check_restock"):
+            wrap(agent, "_check_restock", f"{kind}._check_restock")
+    return timer
+
+class StepProfiler:
+    """Phase timing from now on, plus cProfile / Chrome trace for steps first..last (inclusive;
+    None: unbounded) of the model's step counter."""
+    def __init__(self, model: Any, steps: Optional[Tuple[Optional[int], Optional[int]]] = None,
+                 cprofile_path: Optional[str] = None, trace_path: Optional[str] = None):
+        self.model = model
+        self.first, self.last = steps if steps is not None else (None, None)
+        self.cprofile_path = cprofile_path
+        self.trace_path = trace_path
+        self.timer = attach_phases(model, PhaseTimer())
+        self.steps = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._events: List[Tuple[str, float, float]] = []
+        self._step_spans: List[Tuple[int, float, float]] = []
+        self._origin = time.perf_counter()
+        self._done = False
+        inner = model.step  # already phase-timed
+        def step():
+            n = model.current_step + 1
+            sampled = not self._done and (self.cprofile_path or self.trace_path) and self._in_range(n)
+            if sampled:
+                self._start()
+            t = time.perf_counter()
+            try:
+                return inner()
+            finally:
+                self.steps += 1
+                if sampled:
+                    self._step_spans.append((n, t, time.perf_counter() - t))
+                    self._stop()
+                    if self.last is not None and n >= self.last:
+                        self.finish()
+        model.step = step
+
+    def _in_range(self, n: int) -> bool:
+        return (self.first is None or n >= self.first) and (self.last is None or n <= self.last)
+
+    def _start(self):
+        if self.trace_path:
+            self.timer.trace = self._events
+        if self.cprofile_path:
+            if self._profile is None:
+                self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def _stop(self):
+        self.timer.trace = None
+        if self._profile is not None:
+            self._profile.disable()
+
+    def phases(self) -> Dict[str, Dict[str, float]]:
+        """{phase: {calls, total_ms, per_step_ms}}, most expensive first."""
+        return self.timer.report(self.steps)
+
+    def finish(self):
+        """Write the cProfile stats / Chrome trace collected so far (once)."""
+        if self._done:
+            return
+        self._done = True
+        self._stop()
+        if self._profile is not None and self.cprofile_path:
+            self._profile.dump_stats(self.cprofile_path)
+        if self.trace_path:
+            self._write_trace()
+
+    def _write_trace(self):
+        us = lambda t: round(1e6 * (t - self._origin), 3)
+        events: List[Dict[str, Any]] = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": "BMSModel"}}]
+        for n, t, dur in self._step_spans:
+            events.append({"name": f"step {n}", "cat": "step", "ph": "X", "ts": us(t), "dur": round(1e6 * dur, 3), "pid": os.getpid(), "tid": 0})
+        for phase, t, dur in self._events:
+            events.append({"name": phase, "cat": "phase", "ph": "X", "ts": us(t), "dur": round(1e6 * dur, 3), "pid": os.getpid(), "tid": 0})
+        with open(self.trace_path, "w", encoding="utf-8") as f:  # type: ignore[arg-type]
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,143 @@
+"""Columnar on-disk store of per-step results, one directory per run.
+
+Layout:
+    <root>/<run_id>/meta.json                  params, columns, inventory order, chunk row counts
+    <root>/<run_id>/chunks.npy                 chunk row counts again, so readers skip the JSON
+    <root>/<run_id>/chunk_00000/<column>.npy   one array per column per chunk of steps
+
+ResultsWriter buffers one row per step and writes a chunk (plain .npy files, no pickling) every
+`chunk_size` steps and on flush(), so a crashed run keeps everything up to its last chunk.
+The optional `inventory_qty` column is 2-D (steps x inventories), in meta["inventories"] order.
+meta.json and chunks.npy are rewritten atomically after each chunk and only list complete chunks.
+
+ResultsStore reads columns back with np.load(mmap_mode="r"): only the requested columns of the
+requested runs are touched, and a single-chunk column is returned as a memory map.
+"""
+import hashlib, json, os, re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np  # type: ignore[import-not-found]
+
+_RUN_ID = re.compile(r"^[A-Za-z0-9_.\-]+$")
+
+def _write_json(path: str, obj: Any):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1, default=str)
+    os.replace(tmp, path)
+
+def _write_npy(path: str, arr: np.ndarray):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+def default_run_id(params: Dict[str, Any]) -> str:
+    """Stable run ID from the model parameters (seed included), e.g. 'run-42-3f9c0a1b2c'."""
+    keyed = {k: v for k, v in params.items() if k not in ("results_dir", "run_id")}
+    digest = hashlib.sha1(json.dumps(keyed, sort_keys=True, default=str).encode()).hexdigest()[:10]
+    return f"run-{keyed.get('seed', 0)}-{digest}"
+
+class ResultsWriter:
+    def __init__(self, root: str, run_id: str, params: Optional[Dict[str, Any]] = None,
+                 inventories: Optional[List[str]] = None, chunk_size: int = 256):
+        if not _RUN_ID.match(run_id):
+            raise ValueError(f"Invalid run id {run_id!r}; use letters, digits, '_', '.', '-'")
+        self.dir = os.path.join(root, run_id)
+        os.makedirs(self.dir, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.meta: Dict[str, Any] = {"run_id": run_id, "params": params or {}, "columns": None,
+                                     "inventories": inventories, "chunks": []}
+        self._rows: Dict[str, List[Any]] = {}
+        self._n = 0
+        self._iris: Optional[List[str]] = None
+
+    def append(self, row: Dict[str, Any], inventory_qty: Optional[List[int]] = None):
+        """Buffer one step's metrics (same columns every step)."""
+        if self.meta["columns"] is None:
+            self.meta["columns"] = list(row) + (["inventory_qty"] if inventory_qty is not None else [])
+            self._rows = {c: [] for c in self.meta["columns"]}
+        for c, v in row.items():
+            self._rows[c].append(v)
+        if inventory_qty is not None:
+            self._rows["inventory_qty"].append(inventory_qty)
+        self._n += 1
+        if self._n >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as a new chunk."""
+        if not self._n:
+            return
+        i = len(self.meta["chunks"])
+        chunk_dir = os.path.join(self.dir, f"chunk_{i:05d}")
+        os.makedirs(chunk_dir, exist_ok=True)
+        for c, values in self._rows.items():
+            np.save(os.path.join(chunk_dir, c + ".npy"), np.asarray(values))
+            values.clear()
+        self.meta["chunks"].append(self._n)
+        self._n = 0
+        _write_json(os.path.join(self.dir, "meta.json"), self.meta)
+        _write_npy(os.path.join(self.dir, "chunks.npy"), np.asarray(self.meta["chunks"], dtype=np.int64))
+
+    def close(self):
+        self.flush()
+
+    def record_model(self, model: Any):
+        """Append the model's DataCollector metrics as they are now (the model calls this at the
+        end of a step, so row N is the outcome of step N), plus per-inventory quantities if the
+        writer was created with an inventory list."""
+        row = {"step": model.current_step}
+        row.update({name: reporter(model) for name, reporter in model.datacollector.model_reporters.items()})
+        qty = None
+        if self.meta["inventories"] is not None:
+            if self._iris is None:
+                self._iris = [model.inventories[t].iri for t in self.meta["inventories"]]
+            stock = model.stock._qty
+            qty = [stock.get(iri, 0) for iri in self._iris]
+        self.append(row, qty)
+
+    def get_state(self) -> Dict[str, Any]:
+        """Flush, then return what a resumed run needs to continue this run's files."""
+        self.flush()
+        return json.loads(json.dumps(self.meta, default=str))
+
+    def set_state(self, meta: Dict[str, Any]):
+        """Continue after the chunks listed in `meta` (later chunks on disk are overwritten)."""
+        self.meta = meta
+        self._rows = {c: [] for c in meta["columns"]} if meta["columns"] else {}
+        self._n = 0
+
+class ResultsStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def runs(self) -> List[str]:
+        """Run IDs with at least one complete chunk, sorted."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(r for r in os.listdir(self.root) if os.path.exists(os.path.join(self.root, r, "chunks.npy")))
+
+    def meta(self, run_id: str) -> Dict[str, Any]:
+        with open(os.path.join(self.root, run_id, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def chunks(self, run_id: str, column: str, mmap: bool = True) -> Iterator[np.ndarray]:
+        """Yield the column's chunks (memory-mapped by default)."""
+        for i in range(len(np.load(os.path.join(self.root, run_id, "chunks.npy")))):
+            yield np.load(os.path.join(self.root, run_id, f"chunk_{i:05d}", column + ".npy"), mmap_mode="r" if mmap else None)
+
+    def column(self, run_id: str, column: str, mmap: bool = True) -> np.ndarray:
+        parts = list(self.chunks(run_id, column, mmap))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def load(self, run_id: str, columns: Optional[Iterable[str]] = None, mmap: bool = True) -> Dict[str, np.ndarray]:
+        cols = list(columns) if columns is not None else self.meta(run_id)["columns"]
+        return {c: self.column(run_id, c, mmap) for c in cols}
+
+    def load_many(self, columns: Iterable[str], run_ids: Optional[Iterable[str]] = None, mmap: bool = True) -> Dict[str, Dict[str, np.ndarray]]:
+        """{run_id: {column: array}} for the selected columns of many runs."""
+        cols = list(columns)
+        return {r: self.load(r, cols, mmap) for r in (run_ids if run_ids is not None else self.runs())}
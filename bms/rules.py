@@ -10,18 +10,24 @@ Rules:
 
 2) If Order exists => assert purchases(Customer, Book) (audit trail)
     Order(?o) ^ orderedBy(?o, ?c) ^ forBook(?o, ?b) -> purchases(?c, ?b)
+
+Both rules can be evaluated by Pellet/HermiT (Java) or by the pure-Python engine in bms.swrl.
+Owlready2 runs Pellet/HermiT as one-shot command-line tools, exporting the world and starting a
+JVM on every call; reasoner='native' is the way to avoid that cost per step.
 """
 
-from typing import Any
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from owlready2 import Imp, sync_reasoner_pellet, sync_reasoner  # type: ignore
 
+from bms.swrl import native_engine
+
 def attach_rules(onto: Any):
     with onto:
         # Rule 1: low inventory triggers needsRestock flag via SWRL built-in comparison
+        # (Owlready2 resolves built-ins by bare name: lessThan == swrlb:lessThan)
         try:
-            onto.world.get_ontology("http://www.w3.org/2003/11/swrlb#").load()
             r1 = Imp()
-            r1.set_as_rule("Inventory(?i) ^ availableQuantity(?i, ?q) ^ thresholdQuantity(?i, ?t) ^ swrlb:lessThan(?q, ?t) -> needsRestock(?i, true)")
+            r1.set_as_rule("Inventory(?i) ^ availableQuantity(?i, ?q) ^ thresholdQuantity(?i, ?t) ^ lessThan(?q, ?t) -> needsRestock(?i, true)")
         except Exception:
             r1 = None  # Built-ins unavailable; fallback handled in Python
 
@@ -29,8 +35,16 @@ def attach_rules(onto: Any):
         r2 = Imp()
         r2.set_as_rule("Order(?o) ^ orderedBy(?o, ?c) ^ forBook(?o, ?b) -> purchases(?c, ?b)")
 
-def run_reasoner(onto: Any):
-    """Trigger Pellet/HermiT via Owlready2. Requires Java on the machine."""
+REASONERS = ("jvm", "native")
+
+def run_reasoner(onto: Any, backend: str = "jvm") -> Optional[List[Any]]:
+    """Trigger Pellet/HermiT via Owlready2 (requires Java on the machine) or the pure-Python
+    SWRL engine (backend='native').
+
+    Returns the inferred facts (subject first) for 'native', [] when no JVM reasoner
+    could run, and None when Pellet/HermiT ran (their changes are not reported individually)."""
+    if backend == "native":
+        return native_engine(onto).run()
     try:
         sync_reasoner_pellet([onto], infer_property_values=True)
     except Exception:
@@ -39,4 +53,104 @@ def run_reasoner(onto: Any):
             sync_reasoner([onto], infer_property_values=True)
         except Exception:
             # If reasoning fails, continue without it
-            pass
+            return []
+    return None
+
+
+def needs_restock(inv: Any) -> bool:
+    """Evaluate rule 1 in Python for a single Inventory individual."""
+    q = inv.availableQuantity
+    t = inv.thresholdQuantity
+    return q is not None and t is not None and int(q) < int(t)
+
+def full_restock_scan(onto: Any, backend: str = "jvm", on_inferred: Optional[Callable[[Optional[List[Any]]], None]] = None) -> List[Any]:
+    """Run the reasoner on the whole ontology and collect every inventory flagged by rule 1.
+    `on_inferred` receives what run_reasoner returned."""
+    # Try to infer low-stock state via SWRL rules (falls back if reasoner unavailable)
+    inferred = run_reasoner(onto, backend)
+    if on_inferred is not None:
+        on_inferred(inferred)
+
+    needs = []
+    for inv in onto.Inventory.instances():
+        needs_flag = getattr(inv, "needsRestock", None)
+        if isinstance(needs_flag, (list, tuple)):
+            needs_flag = needs_flag[0] if needs_flag else False
+        if needs_flag:
+            needs.append(inv)
+
+    # Fallback in case the reasoner could not run (e.g., Java missing)
+    if not needs:
+        for inv in onto.Inventory.instances():
+            available = int(inv.availableQuantity) if inv.availableQuantity else 0
+            threshold = int(inv.thresholdQuantity) if inv.thresholdQuantity else 5
+            if available < threshold:
+                needs.append(inv)
+    return needs
+
+class RestockDetector:
+    """Incremental evaluation of rule 1 (low stock => needsRestock).
+
+    Inventories are marked dirty whenever their availableQuantity is written; a check only
+    re-evaluates the rule for those. Modes:
+    - 'incremental' : dirty inventories only (default)
+    - 'reasoner'    : full reasoner run + scan on every check (original behaviour)
+    - 'validate'    : incremental, cross-checked against the full reasoner run
+    `reasoner` picks the backend of the full runs (see run_reasoner).
+    """
+    MODES = ("incremental", "reasoner", "validate")
+
+    def __init__(self, onto: Any, inventories: Iterable[Any] = (), mode: str = "incremental", reasoner: str = "jvm",
+                 before_full_run: Optional[Callable[[], None]] = None,
+                 after_full_run: Optional[Callable[[Optional[List[Any]]], None]] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown restock mode {mode!r}; expected one of {self.MODES}")
+        if reasoner not in REASONERS:
+            raise ValueError(f"Unknown reasoner {reasoner!r}; expected one of {REASONERS}")
+        self.onto = onto
+        self.mode = mode
+        self.reasoner = reasoner
+        self.before_full_run = before_full_run  # e.g. flush journaled orders into the ontology
+        self.after_full_run = after_full_run    # receives the inferred facts (see run_reasoner)
+        self._dirty: Dict[Any, None] = {}  # insertion-ordered set
+        self.mismatches = 0
+        for inv in inventories:
+            self.mark(inv)
+
+    def _full_scan(self) -> List[Any]:
+        if self.before_full_run is not None:
+            self.before_full_run()
+        return full_restock_scan(self.onto, self.reasoner, on_inferred=self.after_full_run)
+
+    def mark(self, inv: Any):
+        self._dirty[inv] = None
+
+    def discard(self, inv: Any):
+        self._dirty.pop(inv, None)
+
+    def check(self, select: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """Return the inventories that currently satisfy rule 1 (only those passing `select`,
+        if given; the others stay marked for a later check)."""
+        if select is None:
+            dirty = list(self._dirty)
+            self._dirty.clear()
+        else:
+            dirty = [inv for inv in self._dirty if select(inv)]
+            for inv in dirty:
+                del self._dirty[inv]
+        if self.mode == "reasoner":
+            full = self._full_scan()
+            return full if select is None else [inv for inv in full if select(inv)]
+
+        needs = [inv for inv in dirty if needs_restock(inv)]
+
+        if self.mode == "validate":
+            full = self._full_scan()
+            if select is not None:
+                full = [inv for inv in full if select(inv)]
+            if set(full) != set(needs):
+                self.mismatches += 1
+                missing = sorted(i.name for i in set(full) - set(needs))
+                extra = sorted(i.name for i in set(needs) - set(full))
+                raise AssertionError(f"Incremental restock check diverged from reasoner: missing={missing} extra={extra}")
+        return needs
@@ -1,8 +1,10 @@
-"""Command-line entrypoint to run the Bookstore MAS simulation."""
-import argparse, os, json
-import matplotlib.pyplot as plt  # type: ignore
+"""Command-line entrypoint to run the Bookstore MAS simulation.
 
-from .model import BMSModel
+Heavy dependencies (Mesa/pandas, Owlready2, matplotlib) are imported only after the arguments
+are parsed, so `--help` and bad flags return immediately; with --no-plot matplotlib is never
+imported at all (check with `python -m bms.bench --import_budget`).
+"""
+import argparse, os, json
 
 def main():
     parser = argparse.ArgumentParser()
@@ -11,27 +13,84 @@ def main():
     parser.add_argument("--customers", default=30, type=int)
     parser.add_argument("--threshold", default=5, type=int)
     parser.add_argument("--restock", default=10, type=int)
+    parser.add_argument("--restock_mode", default="incremental", choices=["incremental", "reasoner", "validate"])
+    parser.add_argument("--reasoner", default="jvm", choices=["jvm", "native"])
+    parser.add_argument("--settlement", default="batch", choices=["batch", "per_message"])
+    parser.add_argument("--customer_mode", default="agents", choices=["agents", "vectorized"])
+    parser.add_argument("--order_mode", default="immediate", choices=["immediate", "journal"])
+    parser.add_argument("--flush_every", default=0, type=int, help="Flush journaled orders every N steps (0: only before reasoning/saving)")
+    parser.add_argument("--rollup_after", default=None, type=int, help="Keep only aggregated purchases facts for orders older than N steps")
+    parser.add_argument("--template_cache", default=None, help="Directory of cached ontology templates (built on first use)")
+    parser.add_argument("--bus_capacity", default=None, type=int, help="Max queued messages per bus topic (default: unbounded)")
+    parser.add_argument("--bus_overflow", default="reject", choices=["block", "drop_oldest", "reject"])
+    parser.add_argument("--bus_block_timeout", default=1.0, type=float, help="Seconds a full 'block' topic waits before failing with BusFull")
+    parser.add_argument("--bus_delivery", default="sync", choices=["sync", "thread", "asyncio"], help="How bus subscribers are run")
+    parser.add_argument("--scheduler", default="random", choices=["random", "sparse"], help="'sparse' only activates agents that act each step")
+    parser.add_argument("--state_backend", default="owl", choices=["owl", "array"], help="'array' keeps inventory state off the ontology until saving")
+    parser.add_argument("--employees", default=1, type=int, help="Number of employees, each owning an inventory shard")
+    parser.add_argument("--shard_by", default="hash", choices=["hash", "genre"])
+    parser.add_argument("--results_dir", default=None, help="Append per-step metrics to a columnar results store here (see bms.results)")
+    parser.add_argument("--run_id", default=None, help="Results run ID (default: derived from the seed and parameters)")
+    parser.add_argument("--record_inventory", action="store_true", help="Also record every inventory's quantity each step")
+    parser.add_argument("--checkpoint", default=None, help="Write a checkpoint file here (at the end, and every --checkpoint_every steps)")
+    parser.add_argument("--checkpoint_every", default=0, type=int)
+    parser.add_argument("--resume", default=None, help="Continue from a checkpoint file instead of the seed (other model flags are ignored)")
+    parser.add_argument("--format", default="rdfxml", choices=["rdfxml", "ntriples", "turtle"], help="Ontology snapshot format")
+    parser.add_argument("--compress", action="store_true", help="gzip the ontology snapshot")
+    parser.add_argument("--profile", action="store_true", help="Time each phase of step() and print the breakdown (also in run_summary.json)")
+    parser.add_argument("--profile_steps", default=None, help="Step range FIRST:LAST (either side may be empty) for --profile_cprofile/--profile_trace")
+    parser.add_argument("--profile_cprofile", default=None, help="Write cProfile stats of the profiled steps here (implies --profile)")
+    parser.add_argument("--profile_trace", default=None, help="Write a Chrome-trace JSON of the profiled steps here (implies --profile)")
+    parser.add_argument("--no_plot", "--no-plot", action="store_true", help="Headless: write metrics.csv but no figure (matplotlib is not loaded)")
     parser.add_argument("--seed_path", default=os.path.join(os.path.dirname(__file__), "data", "seed_books.json"))
     args = parser.parse_args()
 
-    model = BMSModel(seed_path=args.seed_path, N_customers=args.customers, restock_threshold=args.threshold, restock_amount=args.restock, seed=args.seed)
+    from .model import BMSModel
+
+    if args.resume:
+        model = BMSModel.restore(args.resume)
+    else:
+        model = BMSModel(seed_path=args.seed_path, N_customers=args.customers, restock_threshold=args.threshold, restock_amount=args.restock, seed=args.seed, restock_mode=args.restock_mode, reasoner=args.reasoner, settlement=args.settlement, customer_mode=args.customer_mode,
+                         order_mode=args.order_mode, flush_every=args.flush_every, rollup_after=args.rollup_after,
+                         template_cache=args.template_cache, bus_capacity=args.bus_capacity, bus_overflow=args.bus_overflow,
+                         bus_block_timeout=args.bus_block_timeout, bus_delivery=args.bus_delivery, scheduler=args.scheduler,
+                         state_backend=args.state_backend, n_employees=args.employees, shard_by=args.shard_by,
+                         results_dir=args.results_dir, run_id=args.run_id,
+                         record_inventory=args.record_inventory)
+
+    if args.profile or args.profile_cprofile or args.profile_trace:
+        first, _, last = (args.profile_steps or ":").partition(":")
+        model.enable_profiling(steps=(int(first) if first else None, int(last) if last else None),
+                               cprofile_path=args.profile_cprofile, trace_path=args.profile_trace)
 
     for _ in range(args.steps):
         model.step()
+        if args.checkpoint and args.checkpoint_every and model.current_step % args.checkpoint_every == 0:
+            model.checkpoint(args.checkpoint)
+    if args.checkpoint:
+        model.checkpoint(args.checkpoint)
 
     outdir = os.path.join(os.path.dirname(__file__), "..", "report")
-    figsdir = os.path.join(outdir, "figures")
-    os.makedirs(figsdir, exist_ok=True)
+    os.makedirs(outdir, exist_ok=True)
 
-    model.save_artifacts(outdir)
+    model.save_artifacts(outdir, format=args.format, compress=args.compress)
 
-    # Plot basic metrics
+    # Per-step metrics as CSV, plus a plot unless headless
     df = model.datacollector.get_model_vars_dataframe()
-    ax = df.plot(title="BMS — Key Metrics vs. Step")
-    fig = ax.get_figure()
-    fig.tight_layout()
-    fig.savefig(os.path.join(figsdir, "metrics.png"))
+    df.to_csv(os.path.join(outdir, "metrics.csv"))
+    if not args.no_plot:
+        import matplotlib  # type: ignore
+        matplotlib.use("Agg")  # files only; never pick an interactive backend
+        figsdir = os.path.join(outdir, "figures")
+        os.makedirs(figsdir, exist_ok=True)
+        ax = df.plot(title="BMS — Key Metrics vs. Step")
+        fig = ax.get_figure()
+        fig.tight_layout()
+        fig.savefig(os.path.join(figsdir, "metrics.png"))
 
+    if model.profiler is not None:
+        model.profiler.finish()
+        print(json.dumps({"phase_timings": model.profiler.phases()}, indent=2))
     print(json.dumps({"summary": {
         "total_sales": model.total_sales,
         "sold_count": model.sold_count,
@@ -0,0 +1,94 @@
+"""Sparse activation scheduler: step cost scales with the agents that act, not the population.
+
+RandomActivation calls every agent every step, including no-op BookAgents and customers that
+only roll a die and return. SparseActivation classifies agents by their `activation` attribute:
+- 'always'  (default): stepped every step, like RandomActivation.
+- 'sampled' : Bernoulli agents exposing `activation_prob` and `act()`. Each step draws how many
+              of them act from a binomial distribution (one draw per distinct probability), then
+              picks that many uniformly without replacement and calls act() -- O(active) work.
+              activation_prob is read when the agent is added.
+- 'inert'   : registered (schedule.agents, get_agent_count) but never stepped.
+Any agent can also be woken at a given step with wake_at(agent, step); its step() runs then.
+The due agents of a step are activated in random order (model.random), as in RandomActivation.
+
+The sampled draws use a different random stream than the per-agent dice, so runs are
+reproducible per seed but not identical to RandomActivation runs.
+"""
+import heapq, itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np  # type: ignore[import-not-found]
+from mesa.time import BaseScheduler  # type: ignore[import-not-found]
+
+class SparseActivation(BaseScheduler):
+    def __init__(self, model: Any, seed: Optional[int] = None):
+        super().__init__(model)
+        self.rng = np.random.default_rng(seed)
+        self._always: List[Any] = []
+        self._sampled: Dict[float, List[Any]] = {}
+        self._wakeups: List[Tuple[int, int, Any]] = []
+        self._seq = itertools.count()
+        self.last_active = 0  # agents activated by the last step
+
+    def add(self, agent: Any) -> None:
+        super().add(agent)
+        kind = getattr(agent, "activation", "always")
+        if kind == "sampled":
+            self._sampled.setdefault(float(agent.activation_prob), []).append(agent)
+        elif kind == "always":
+            self._always.append(agent)
+        elif kind != "inert":
+            raise ValueError(f"Unknown activation {kind!r}; expected 'always', 'sampled' or 'inert'")
+
+    def remove(self, agent: Any) -> None:
+        super().remove(agent)
+        kind = getattr(agent, "activation", "always")
+        if kind == "sampled":
+            group = self._sampled[float(agent.activation_prob)]
+            group.remove(agent)
+        elif kind == "always":
+            self._always.remove(agent)
+        self._wakeups = [w for w in self._wakeups if w[2] is not agent]
+        heapq.heapify(self._wakeups)
+
+    def wake_at(self, agent: Any, step: int):
+        """Run agent.step() during schedule step `step` (schedule.steps == step when it runs)."""
+        heapq.heappush(self._wakeups, (step, next(self._seq), agent))
+
+    def get_state(self) -> Dict[str, Any]:
+        """Order-sensitive state for checkpoints (agents by unique_id)."""
+        seq = next(self._seq)
+        self._seq = itertools.count(seq)
+        return {"rng": self.rng.bit_generator.state,
+                "always": [a.unique_id for a in self._always],
+                "sampled": {p: [a.unique_id for a in g] for p, g in self._sampled.items()},
+                "wakeups": [(step, seq, a.unique_id) for step, seq, a in self._wakeups],
+                "seq": seq}
+
+    def set_state(self, state: Dict[str, Any]):
+        by_id = {a.unique_id: a for a in self._agents}
+        self.rng.bit_generator.state = state["rng"]
+        self._always = [by_id[u] for u in state["always"]]
+        self._sampled = {p: [by_id[u] for u in g] for p, g in state["sampled"].items()}
+        self._wakeups = [(step, seq, by_id[u]) for step, seq, u in state["wakeups"]]
+        self._seq = itertools.count(state["seq"])
+
+    def step(self) -> None:
+        m_model: Any = self.model
+        rnd = m_model.random
+        due: List[Tuple[Any, bool]] = [(a, False) for a in self._always]
+        while self._wakeups and self._wakeups[0][0] <= self.steps:
+            due.append((heapq.heappop(self._wakeups)[2], False))
+        for p, group in self._sampled.items():
+            k = int(self.rng.binomial(len(group), p)) if group else 0
+            if k:
+                due.extend((a, True) for a in rnd.sample(group, k))
+        rnd.shuffle(due)
+        for agent, sampled in due:
+            if sampled:
+                agent.act()
+            else:
+                agent.step()
+        self.last_active = len(due)
+        self.steps += 1
+        self.time += 1
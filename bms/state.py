@@ -0,0 +1,227 @@
+"""Pluggable simulation state backends for BMSModel (`state_backend=`).
+
+The settlement/restock hot path (EmployeeAgent) reads and writes inventory state through
+`model.state`. Keys are opaque: whatever lookup() returns is passed back to the other calls.
+- 'owl'   : OwlState, the original behaviour. Every read/write is an Owlready2 property access
+            on the Inventory/Book individuals; rule 1 is checked by the RestockDetector.
+- 'array' : ArrayState. Quantities, thresholds, restock amounts, prices and names live in
+            plain Python arrays indexed by inventory slot, and orders are always journaled. The
+            ontology is only updated by project(), called from model.flush_orders(): every
+            flush_every steps, in save_artifacts, or on demand. Supports restock_mode=
+            'incremental' only (full reasoner runs need an up-to-date ontology).
+
+Both backends consume the same random numbers in the same order, so a seed gives identical
+metrics; check_equivalence() (also `python -m bms.state`) runs both and compares them.
+"""
+from array import array
+from typing import Any, Dict, List, Optional
+
+BACKENDS = ("owl", "array")
+
+class OwlState:
+    name = "owl"
+
+    def __init__(self, model: Any):
+        self.model = model
+
+    def lookup(self, book_iri: str) -> Optional[Any]:
+        return self.model.inventory_by_book.get(book_iri)
+
+    def quantity(self, inv: Any) -> int:
+        return int(inv.availableQuantity)
+
+    def set_quantity(self, inv: Any, qty: int):
+        self.model.set_available_quantity(inv, qty)
+
+    def price(self, book_iri: str) -> float:
+        return float(self.model.onto.world[book_iri].hasPrice)
+
+    def book_name(self, book_iri: str) -> str:
+        return self.model.onto.world[book_iri].name
+
+    def inventory_name(self, inv: Any) -> str:
+        return inv.name
+
+    def restock_amount(self, inv: Any) -> int:
+        return int(inv.restockAmount) if inv.restockAmount else 10
+
+    def due_restock(self, shard: Optional[int] = None) -> List[Any]:
+        if shard is None:
+            return self.model.restock_detector.check()
+        router = self.model.router
+        return self.model.restock_detector.check(select=lambda inv: router.inventory_shard(inv) == shard)
+
+    def clear_restock_flag(self, inv: Any):
+        try:
+            inv.needsRestock = False
+        except Exception:
+            pass
+
+    def register(self, inv: Any):
+        pass
+
+    def unregister(self, inv: Any):
+        pass
+
+    def project(self):
+        """Materialize journaled orders into the ontology (no-op without a journal)."""
+        m = self.model
+        if m.journal is None:
+            return
+        for iri in m.journal.flush(m.customers, m.current_step):
+            m.touch(iri)
+
+    def get_state(self) -> Any:
+        return None
+
+    def set_state(self, state: Any):
+        pass
+
+class ArrayState:
+    name = "array"
+
+    def __init__(self, model: Any):
+        self.model = model
+        self.slot: Dict[str, int] = {}       # book IRI -> inventory slot
+        self.invs: List[Any] = []            # Inventory individual per slot (for projection)
+        self.inv_iri: List[str] = []
+        self.inv_name: List[str] = []
+        self.qty = array("q")
+        self.threshold = array("q")
+        self.restock = array("q")
+        self.needs = bytearray()             # needsRestock per slot
+        self.price_of: Dict[str, float] = {}
+        self.name_of: Dict[str, str] = {}
+        self._dirty: Dict[int, None] = {}        # slots to re-check for rule 1
+        self._unprojected: Dict[int, None] = {}  # slots whose values the ontology doesn't have yet
+        for inv in model.inventories.values():
+            self.register(inv)
+
+    def register(self, inv: Any):
+        k = len(self.invs)
+        self.invs.append(inv)
+        self.inv_iri.append(inv.iri)
+        self.inv_name.append(inv.name)
+        q, t, r = inv.availableQuantity, inv.thresholdQuantity, inv.restockAmount
+        self.qty.append(int(q) if q is not None else 0)
+        # A missing threshold never triggers rule 1 (as in rules.needs_restock)
+        self.threshold.append(int(t) if t is not None else -(1 << 62))
+        self.restock.append(int(r) if r else 10)
+        self.needs.append(bool(inv.needsRestock))
+        for b in inv.hasBook:
+            self.slot[b.iri] = k
+            self.price_of[b.iri] = float(b.hasPrice) if b.hasPrice is not None else 0.0
+            self.name_of[b.iri] = b.name
+        self._dirty[k] = None
+
+    def unregister(self, inv: Any):
+        for b in inv.hasBook:
+            k = self.slot.get(b.iri)
+            if k is not None and self.invs[k] is inv:
+                del self.slot[b.iri]
+                self._dirty.pop(k, None)
+
+    def lookup(self, book_iri: str) -> Optional[int]:
+        return self.slot.get(book_iri)
+
+    def quantity(self, k: int) -> int:
+        return self.qty[k]
+
+    def set_quantity(self, k: int, qty: int):
+        self.qty[k] = qty
+        self.model.stock.set_iri(self.inv_iri[k], qty)
+        self._dirty[k] = None
+        self._unprojected[k] = None
+
+    def price(self, book_iri: str) -> float:
+        return self.price_of[book_iri]
+
+    def book_name(self, book_iri: str) -> str:
+        name = self.name_of.get(book_iri)
+        return name if name is not None else self.model.onto.world[book_iri].name
+
+    def inventory_name(self, k: int) -> str:
+        return self.inv_name[k]
+
+    def restock_amount(self, k: int) -> int:
+        return self.restock[k]
+
+    def due_restock(self, shard: Optional[int] = None) -> List[int]:
+        if shard is None:
+            dirty = list(self._dirty)
+            self._dirty.clear()
+        else:
+            shard_of, invs = self.model.router.inventory_shard, self.invs
+            dirty = [k for k in self._dirty if shard_of(invs[k]) == shard]
+            for k in dirty:
+                del self._dirty[k]
+        qty, threshold = self.qty, self.threshold
+        return [k for k in dirty if qty[k] < threshold[k]]
+
+    def clear_restock_flag(self, k: int):
+        self.needs[k] = 0
+        self._unprojected[k] = None
+
+    def project(self):
+        """Write changed inventory values and journaled orders into the ontology."""
+        m = self.model
+        for k in self._unprojected:
+            inv = self.invs[k]
+            inv.availableQuantity = self.qty[k]
+            inv.needsRestock = bool(self.needs[k])
+            m.touch(inv)
+        self._unprojected.clear()
+        for iri in m.journal.flush(m.customers, m.current_step):
+            m.touch(iri)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"qty": self.qty, "needs": self.needs, "dirty": list(self._dirty), "unprojected": list(self._unprojected)}
+
+    def set_state(self, state: Dict[str, Any]):
+        self.qty, self.needs = state["qty"], state["needs"]
+        self._dirty = dict.fromkeys(state["dirty"])
+        self._unprojected = dict.fromkeys(state["unprojected"])
+
+def make_state(model: Any, backend: str) -> Any:
+    if backend == "owl":
+        return OwlState(model)
+    if backend == "array":
+        return ArrayState(model)
+    raise ValueError(f"Unknown state backend {backend!r}; expected one of {BACKENDS}")
+
+def check_equivalence(steps: int = 40, **params: Any) -> Dict[str, Any]:
+    """Run the 'owl' and 'array' backends with the same parameters and assert identical metrics,
+    DataCollector history and final inventory quantities. Returns the shared summary."""
+    from bms.model import BMSModel
+    runs = {}
+    for backend in BACKENDS:
+        m = BMSModel(state_backend=backend, **params)
+        for _ in range(steps):
+            m.step()
+        m.flush_orders()
+        df = m.datacollector.get_model_vars_dataframe()
+        runs[backend] = {
+            "summary": {"total_sales": m.total_sales, "sold_count": m.sold_count, "restocks": m.restocks, "stockouts": m.stockouts},
+            "history": df[[c for c in df.columns if not c.endswith("_ms")]].to_dict("list"),  # wall-clock columns differ
+            "quantities": {t: int(inv.availableQuantity) for t, inv in m.inventories.items()},
+        }
+    owl, arr = runs["owl"], runs["array"]
+    for part in ("summary", "history", "quantities"):
+        if owl[part] != arr[part]:
+            raise AssertionError(f"State backends diverged in {part}: owl={owl[part]!r} array={arr[part]!r}")
+    return owl["summary"]
+
+if __name__ == "__main__":
+    import argparse, json, os
+
+    parser = argparse.ArgumentParser(description="Check that the owl and array state backends give identical results")
+    parser.add_argument("--steps", default=40, type=int)
+    parser.add_argument("--customers", default=30, type=int)
+    parser.add_argument("--seed", default=42, type=int)
+    parser.add_argument("--customer_mode", default="agents", choices=["agents", "vectorized"])
+    parser.add_argument("--settlement", default="batch", choices=["batch", "per_message"])
+    parser.add_argument("--seed_path", default=os.path.join(os.path.dirname(__file__), "data", "seed_books.json"))
+    args = parser.parse_args()
+    summary = check_equivalence(steps=args.steps, seed_path=args.seed_path, N_customers=args.customers, seed=args.seed,
+                                customer_mode=args.customer_mode, settlement=args.settlement, restock_mode="incremental", order_mode="journal")
+    print(json.dumps({"equivalent": True, "summary": summary}, indent=2))
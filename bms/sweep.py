@@ -0,0 +1,114 @@
+"""Parallel parameter sweeps over BMSModel.
+
+grid() expands axes such as customers x threshold x restock x seeds into run configurations;
+sweep() runs them in a process pool (spawn: each worker opens its own Owlready2 world, so workers
+share nothing; with template_cache the worlds are cloned from a cached template) and yields each run's summary as soon as it
+finishes. aggregate() groups replications that differ only by seed and reports the mean,
+standard deviation and a 95% confidence interval (Student t) of every metric.
+
+    python -m bms.sweep --customers 30 60 --threshold 2 5 --seeds 10 --steps 40 --workers 8
+
+prints one JSON line per finished run, then the aggregate table. With --results_dir every run
+also writes its per-step metrics to a bms.results store.
+"""
+import itertools, math, multiprocessing, os, statistics, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from bms import template as templatemod
+
+SEED_PATH = os.path.join(os.path.dirname(__file__), "data", "seed_books.json")
+METRICS = ("total_sales", "sold_count", "restocks", "stockouts", "units_in_stock", "books_in_stock", "seconds")
+# Two-sided 95% Student t quantiles for 1..30 degrees of freedom (normal beyond)
+_T95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+        2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+_NOT_IN_KEY = ("seed", "seed_path", "template_cache", "results_dir", "run_id", "record_inventory")
+
+def grid(customers: Iterable[int] = (30,), threshold: Iterable[int] = (5,), restock: Iterable[int] = (10,),
+         seeds: Iterable[int] = (42,), steps: Iterable[int] = (40,), **fixed: Any) -> List[Dict[str, Any]]:
+    """One config per combination; `fixed` are extra BMSModel kwargs shared by every run."""
+    return [dict(fixed, N_customers=c, restock_threshold=t, restock_amount=r, seed=s, steps=n)
+            for c, t, r, n, s in itertools.product(customers, threshold, restock, steps, seeds)]
+
+def config_key(config: Dict[str, Any]) -> str:
+    """Label of a configuration without its seed (replications share it)."""
+    return " ".join(f"{k}={config[k]}" for k in sorted(config) if k not in _NOT_IN_KEY)
+
+def run_one(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Build and run one model (in a worker process); return its config and final metrics."""
+    from bms.model import BMSModel
+    params = dict(config)
+    steps = params.pop("steps")
+    params.setdefault("seed_path", SEED_PATH)
+    t = time.perf_counter()
+    m = BMSModel(**params)
+    try:
+        for _ in range(steps):
+            m.step()
+    finally:
+        m.close()
+    return {"config": config, "key": config_key(config), "run_id": m.run_id,
+            "total_sales": m.total_sales, "sold_count": m.sold_count, "restocks": m.restocks, "stockouts": m.stockouts,
+            "units_in_stock": m.stock.units_in_stock, "books_in_stock": m.stock.books_in_stock,
+            "seconds": time.perf_counter() - t}
+
+def sweep(configs: List[Dict[str, Any]], workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Run every config across a process pool, yielding results in completion order."""
+    # Build the shared templates once up front instead of racing to build them in every worker
+    for seed_path, cache in {(c.get("seed_path", SEED_PATH), c.get("template_cache")) for c in configs}:
+        if cache:
+            for t, r in {(c.get("restock_threshold", 5), c.get("restock_amount", 10)) for c in configs}:
+                templatemod.ensure_template(seed_path, cache, default_threshold=t, default_restock=r)
+    ctx = multiprocessing.get_context("spawn")  # no inherited SQLite handles
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=ctx) as pool:
+        for fut in as_completed([pool.submit(run_one, c) for c in configs]):
+            yield fut.result()
+
+def _ci95(values: List[float]) -> float:
+    n = len(values)
+    if n < 2:
+        return 0.0
+    t = _T95[n - 2] if n - 1 <= len(_T95) else 1.960
+    return t * statistics.stdev(values) / math.sqrt(n)
+
+def aggregate(results: Iterable[Dict[str, Any]], metrics: Iterable[str] = METRICS) -> Dict[str, Dict[str, Any]]:
+    """{config key: {"n": replications, metric: {"mean", "std", "ci95"}}}, keys sorted."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for r in results:
+        groups.setdefault(r["key"], []).append(r)
+    out: Dict[str, Dict[str, Any]] = {}
+    for key in sorted(groups):
+        rows = groups[key]
+        agg: Dict[str, Any] = {"n": len(rows)}
+        for name in metrics:
+            values = [float(r[name]) for r in rows]
+            agg[name] = {"mean": statistics.fmean(values), "std": statistics.stdev(values) if len(values) > 1 else 0.0,
+                         "ci95": _ci95(values)}
+        out[key] = agg
+    return out
+
+if __name__ == "__main__":
+    import argparse, json
+
+    parser = argparse.ArgumentParser(description="Run a BMSModel parameter sweep in parallel")
+    parser.add_argument("--customers", nargs="+", default=[30], type=int)
+    parser.add_argument("--threshold", nargs="+", default=[5], type=int)
+    parser.add_argument("--restock", nargs="+", default=[10], type=int)
+    parser.add_argument("--steps", nargs="+", default=[40], type=int)
+    parser.add_argument("--seeds", default=5, type=int, help="Replications per configuration (seeds base_seed..base_seed+N-1)")
+    parser.add_argument("--base_seed", default=0, type=int)
+    parser.add_argument("--workers", default=None, type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--results_dir", default=None, help="Write every run's per-step metrics to this results store")
+    parser.add_argument("--template_cache", default=None,
+                        help=f"Directory of cached ontology templates, shared by the workers (e.g. {templatemod.DEFAULT_CACHE_DIR})")
+    parser.add_argument("--seed_path", default=SEED_PATH)
+    args = parser.parse_args()
+
+    configs = grid(args.customers, args.threshold, args.restock, range(args.base_seed, args.base_seed + args.seeds), args.steps,
+                   seed_path=args.seed_path, template_cache=args.template_cache, results_dir=args.results_dir)
+    results = []
+    for r in sweep(configs, args.workers):
+        results.append(r)
+        print(json.dumps({k: v for k, v in r.items() if k != "config"}), flush=True)
+    print(json.dumps(aggregate(results), indent=2))
@@ -0,0 +1,346 @@
+"""Pure-Python forward-chaining evaluator for the SWRL rules (no JVM required).
+
+The `Imp` rules attached by `bms.rules.attach_rules` are compiled from their Owlready2
+representation and evaluated semi-naively over the quadstore: every round joins only the
+facts that are new since the previous round against everything already known. Across calls
+the engine keeps a snapshot of the relations the rules mention. Once track() is on, callers
+report changed subjects with touch() (BMSModel.touch does), and a later run re-reads only
+those subjects' triples, so it pays for the changes since the previous run rather than for
+the whole history. Without tracking, every run re-reads the relations and diffs them.
+
+Supported atoms: ClassAtom, IndividualPropertyAtom, DatavaluedPropertyAtom and the swrlb
+comparison built-ins (equal, notEqual, lessThan, lessThanOrEqual, greaterThan,
+greaterThanOrEqual).
+"""
+import operator, weakref
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from owlready2 import (  # type: ignore[import-not-found]
+    BuiltinAtom,
+    ClassAtom,
+    DataProperty,
+    DatavaluedPropertyAtom,
+    FunctionalProperty,
+    IndividualPropertyAtom,
+    Variable,
+    rdf_type,
+)
+from owlready2.base import from_literal  # type: ignore[import-not-found]
+
+BUILTINS: Dict[str, Callable[[Any, Any], bool]] = {
+    "equal": operator.eq,
+    "notEqual": operator.ne,
+    "lessThan": operator.lt,
+    "lessThanOrEqual": operator.le,
+    "greaterThan": operator.gt,
+    "greaterThanOrEqual": operator.ge,
+}
+
+class Fact(NamedTuple):
+    """An inferred fact. For class membership the predicate is 'rdf:type' and value the class."""
+    subject: Any
+    predicate: Any
+    value: Any
+
+class _Var(str):
+    """A rule variable (kept distinct from string literals)."""
+
+# Relation keys: a property storid, or ("type", class storid) for class membership.
+# Every relation holds (subject, object) pairs; class facts use the class storid as object.
+Key = Any
+Pair = Tuple[Any, Any]
+
+class _Atom(NamedTuple):
+    key: Key
+    a: Any
+    b: Any
+
+class _Builtin(NamedTuple):
+    op: Callable[[Any, Any], bool]
+    args: Tuple[Any, ...]
+
+class _Rule(NamedTuple):
+    name: str
+    body: Tuple[_Atom, ...]
+    builtins: Tuple[_Builtin, ...]
+    head: Tuple[_Atom, ...]
+
+class _Relation:
+    """In-memory copy of one relation, indexed by subject and object."""
+    def __init__(self):
+        self.pairs: Set[Pair] = set()
+        self.by_s: Dict[Any, Set[Any]] = {}
+        self.by_o: Dict[Any, Set[Any]] = {}
+
+    def add(self, pair: Pair):
+        self.pairs.add(pair)
+        self.by_s.setdefault(pair[0], set()).add(pair[1])
+        self.by_o.setdefault(pair[1], set()).add(pair[0])
+
+    def discard(self, pair: Pair):
+        if pair in self.pairs:
+            self.pairs.discard(pair)
+            for index, k, v in ((self.by_s, pair[0], pair[1]), (self.by_o, pair[1], pair[0])):
+                values = index[k]
+                values.discard(v)
+                if not values:
+                    del index[k]
+
+    def match(self, s: Any, o: Any) -> Iterable[Pair]:
+        if s is not None and o is not None:
+            return ((s, o),) if (s, o) in self.pairs else ()
+        if s is not None:
+            return [(s, x) for x in self.by_s.get(s, ())]
+        if o is not None:
+            return [(x, o) for x in self.by_o.get(o, ())]
+        return list(self.pairs)
+
+def _resolve(arg: Any, binding: Dict[str, Any]) -> Any:
+    return binding.get(arg) if isinstance(arg, _Var) else arg
+
+def _unify(atom: _Atom, pair: Pair, binding: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    out = binding
+    for arg, val in ((atom.a, pair[0]), (atom.b, pair[1])):
+        if isinstance(arg, _Var):
+            bound = out.get(arg)
+            if bound is None:
+                if out is binding:
+                    out = dict(binding)
+                out[arg] = val
+            elif bound != val:
+                return None
+        elif arg != val:
+            return None
+    return out
+
+class RuleEngine:
+    """Semi-naive SWRL evaluator bound to one ontology."""
+
+    def __init__(self, onto: Any):
+        self.onto = onto
+        self.world = onto.world
+        self.rules: List[_Rule] = []
+        self._rels: Dict[Key, _Relation] = {}
+        self._writers: Dict[Key, Callable[[Any, Any], None]] = {}
+        self._is_data: Dict[Key, bool] = {}
+        self._class_members: Dict[Key, List[int]] = {}
+        self._touched: Optional[Dict[int, None]] = None  # subjects changed since the last run (None: not tracking)
+        self._synced = False  # the snapshot reflects the quadstore as of the last run
+        self.reload_rules()
+
+    # ---- compilation -------------------------------------------------------------------
+
+    def reload_rules(self):
+        """(Re)compile the Imp rules of the ontology and reset the fact snapshot."""
+        self.rules = [self._compile(r) for r in self.onto.rules()]
+        self._rels = {}
+        for rule in self.rules:
+            for atom in rule.body + rule.head:
+                self._rels.setdefault(atom.key, _Relation())
+        self._body_keys = {atom.key for rule in self.rules for atom in rule.body}
+        self._synced = False
+
+    def track(self):
+        """Rely on touch() for changes from now on (the next run still reads everything once)."""
+        if self._touched is None:
+            self._touched = {}
+            self._synced = False
+
+    def touch(self, entity: Any):
+        """Record a subject (entity or IRI) whose triples changed since the last run."""
+        if self._touched is None:
+            return
+        storid = self.world._abbreviate(entity, False) if isinstance(entity, str) else entity.storid
+        if storid is not None:
+            self._touched[storid] = None
+
+    def forget(self, storids: Iterable[int]):
+        """Drop every fact about subjects deleted from the quadstore (their IRIs may no longer
+        resolve, so touch() can't reach them)."""
+        for s in storids:
+            for rel in self._rels.values():
+                for o in list(rel.by_s.get(s, ())):
+                    rel.discard((s, o))
+
+    def _arg(self, x: Any) -> Any:
+        if isinstance(x, Variable):
+            return _Var(x.name)
+        return getattr(x, "storid", x)
+
+    def _compile(self, imp: Any) -> _Rule:
+        body: List[_Atom] = []
+        builtins: List[_Builtin] = []
+        for atom in imp.body:
+            if isinstance(atom, BuiltinAtom):
+                name = str(atom.builtin).rsplit("#", 1)[-1].rsplit(":", 1)[-1]
+                if name not in BUILTINS:
+                    raise ValueError(f"Unsupported SWRL built-in {name!r} ({atom!r}) in rule {imp}")
+                arguments: Any = atom.arguments  # inferred as Optional from owlready2's source
+                builtins.append(_Builtin(BUILTINS[name], tuple(self._arg(x) for x in arguments)))
+            else:
+                body.append(self._relational(atom, imp))
+        head = tuple(self._relational(atom, imp) for atom in imp.head)
+        return _Rule(str(imp), tuple(body), tuple(builtins), head)
+
+    def _relational(self, atom: Any, imp: Any) -> _Atom:
+        if isinstance(atom, ClassAtom):
+            cls: Any = atom.class_predicate
+            key = ("type", cls.storid)
+            self._class_members[key] = [c.storid for c in cls.descendants()]
+            self._writers[key] = lambda s, _o, cls=cls: s.is_a.append(cls) if cls not in s.is_a else None
+            self._is_data[key] = False
+            return _Atom(key, self._arg(atom.arguments[0]), cls.storid)
+        if isinstance(atom, (IndividualPropertyAtom, DatavaluedPropertyAtom)):
+            prop: Any = atom.property_predicate
+            key = prop.storid
+            self._is_data[key] = issubclass(prop, DataProperty)
+            self._writers[key] = self._property_writer(prop)
+            a, b = atom.arguments
+            return _Atom(key, self._arg(a), self._arg(b))
+        raise ValueError(f"Unsupported SWRL atom {atom!r} in rule {imp}")
+
+    def _property_writer(self, prop: Any) -> Callable[[Any, Any], None]:
+        # Head facts go through the entity API so Owlready2's attribute cache stays coherent
+        name = prop.python_name
+        if issubclass(prop, FunctionalProperty):
+            return lambda s, o: setattr(s, name, o)
+        return lambda s, o: getattr(s, name).append(o)
+
+    # ---- quadstore access ----------------------------------------------------------------
+
+    def _load(self, key: Key, subject: Optional[int] = None) -> Set[Pair]:
+        """The relation's pairs in the quadstore (only `subject`'s, if given)."""
+        world = self.world
+        if key in self._class_members:
+            cls_storid = key[1]
+            return {(s, cls_storid) for c in self._class_members[key] for s, _p, _o in world._get_obj_triples_spo_spo(subject, rdf_type, c)}
+        if self._is_data[key]:
+            return {(s, from_literal(o, d)) for s, _p, o, d in world._get_data_triples_spod_spod(subject, key, None, None)}
+        return {(s, o) for s, _p, o in world._get_obj_triples_spo_spo(subject, key, None)}
+
+    def _sync(self, rel: _Relation, current: Set[Pair], old: Set[Pair]) -> Set[Pair]:
+        for pair in old - current:
+            rel.discard(pair)
+        added = current - old
+        for pair in added:
+            rel.add(pair)
+        return added
+
+    def _refresh(self, full: bool) -> Dict[Key, Set[Pair]]:
+        """Sync the snapshot with the quadstore and return the new body facts."""
+        delta: Dict[Key, Set[Pair]] = {}
+        if full or not self._synced or self._touched is None:
+            for key in self._rels:
+                if full:
+                    self._rels[key] = _Relation()
+                rel = self._rels[key]
+                added = self._sync(rel, self._load(key), set(rel.pairs))
+                if added and key in self._body_keys:
+                    delta[key] = added
+            self._synced = True
+            if self._touched is not None:
+                self._touched.clear()
+            return delta
+        # Incremental: re-read only the subjects touched since the last run
+        subjects = list(self._touched)
+        self._touched.clear()
+        for key, rel in self._rels.items():
+            added: Set[Pair] = set()
+            for s in subjects:
+                added |= self._sync(rel, self._load(key, s), {(s, o) for o in rel.by_s.get(s, ())})
+            if added and key in self._body_keys:
+                delta[key] = added
+        return delta
+
+    # ---- evaluation ----------------------------------------------------------------------
+
+    def _builtins_hold(self, builtins: Tuple[_Builtin, ...], binding: Dict[str, Any], final: bool) -> bool:
+        for bi in builtins:
+            args = [_resolve(x, binding) for x in bi.args]
+            if any(v is None for v in args):
+                if final:
+                    return False  # unsafe rule: built-in variable never bound
+                continue
+            try:
+                if not bi.op(*args):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _join(self, atoms: Tuple[_Atom, ...], builtins: Tuple[_Builtin, ...], binding: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if not self._builtins_hold(builtins, binding, final=not atoms):
+            return
+        if not atoms:
+            yield binding
+            return
+        # Most-bound atom first keeps the join selective
+        idx = max(range(len(atoms)), key=lambda j: (_resolve(atoms[j].a, binding) is not None) + (_resolve(atoms[j].b, binding) is not None))
+        atom = atoms[idx]
+        rest = atoms[:idx] + atoms[idx + 1:]
+        for pair in self._rels[atom.key].match(_resolve(atom.a, binding), _resolve(atom.b, binding)):
+            b2 = _unify(atom, pair, binding)
+            if b2 is not None:
+                yield from self._join(rest, builtins, b2)
+
+    def run(self, full: bool = False, max_rounds: int = 1000) -> List[Fact]:
+        """Evaluate the rules to a fixpoint and assert the new facts into the ontology.
+
+        With full=True the snapshot is discarded first, so every fact is treated as new
+        (equivalent to a from-scratch reasoner run)."""
+        delta = self._refresh(full)
+        inferred: List[Fact] = []
+        rounds = 0
+        while delta and rounds < max_rounds:
+            rounds += 1
+            new: Dict[Key, Set[Pair]] = {}
+            for rule in self.rules:
+                for i, atom in enumerate(rule.body):
+                    facts = delta.get(atom.key)
+                    if not facts:
+                        continue
+                    rest = rule.body[:i] + rule.body[i + 1:]
+                    for pair in facts:
+                        start = _unify(atom, pair, {})
+                        if start is None:
+                            continue
+                        for binding in self._join(rest, rule.builtins, start):
+                            for h in rule.head:
+                                hp = (_resolve(h.a, binding), _resolve(h.b, binding))
+                                if hp not in self._rels[h.key].pairs:
+                                    new.setdefault(h.key, set()).add(hp)
+            for key, pairs in new.items():
+                for pair in pairs:
+                    inferred.append(self._assert(key, pair))
+            delta = {k: v for k, v in new.items() if k in self._body_keys}
+        return inferred
+
+    def _assert(self, key: Key, pair: Pair) -> Fact:
+        rel = self._rels[key]
+        entity = self.world._get_by_storid
+        s = entity(pair[0])
+        if key in self._class_members:
+            o, pred = entity(pair[1]), "rdf:type"
+        else:
+            o = pair[1] if self._is_data[key] else entity(pair[1])
+            pred = entity(key)
+            if issubclass(pred, FunctionalProperty):
+                # A functional value replaces the previous one
+                for old in list(rel.by_s.get(pair[0], ())):
+                    rel.discard((pair[0], old))
+        self._writers[key](s, o)
+        rel.add(pair)
+        return Fact(s, pred, o)
+
+_ENGINES: "weakref.WeakKeyDictionary[Any, RuleEngine]" = weakref.WeakKeyDictionary()
+
+def native_engine(onto: Any) -> RuleEngine:
+    """Return the (cached) rule engine of an ontology, so snapshots persist across calls."""
+    engine = _ENGINES.get(onto)
+    if engine is None:
+        engine = _ENGINES[onto] = RuleEngine(onto)
+    return engine
+
+def drop_engine(onto: Any):
+    """Forget the cached engine (e.g. after the quadstore was replaced); the next run starts fresh."""
+    _ENGINES.pop(onto, None)
@@ -0,0 +1,73 @@
+"""Template cache for fast BMSModel startup.
+
+Building the ontology, attaching the SWRL rules and seeding the catalog is the same work for
+every model created from the same seed file and parameters. A template does it once and
+persists the result as an Owlready2 SQLite quadstore, keyed by a hash of the seed file and the
+parameters, plus a small JSON manifest (title -> book/inventory IRIs, in seed order).
+
+Each model then gets a private in-memory clone of the template through SQLite's backup API
+(a page-level copy, milliseconds even for large catalogs); writes never touch the cached file.
+"""
+import hashlib, json, os, sqlite3
+from contextlib import closing
+from typing import Any, Dict, Tuple
+
+from owlready2 import World  # type: ignore[import-not-found]
+
+from bms import loader
+from bms import ontology as ontomod
+from bms import rules as rulesmod
+
+TEMPLATE_VERSION = 2  # bump when build_ontology/attach_rules/the catalog loader change what they write
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bms", "templates")
+
+def template_key(seed_path: str, **params: Any) -> str:
+    h = hashlib.sha256(f"bms-template-v{TEMPLATE_VERSION}".encode())
+    with open(seed_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+def ensure_template(seed_path: str, cache_dir: str, default_threshold: int = 5, default_restock: int = 10) -> Tuple[str, str]:
+    """Return (quadstore path, manifest path) of the template, building it on a cache miss."""
+    key = template_key(seed_path, default_threshold=default_threshold, default_restock=default_restock)
+    db_path = os.path.join(cache_dir, key + ".sqlite3")
+    manifest_path = os.path.join(cache_dir, key + ".json")
+    if os.path.exists(db_path) and os.path.exists(manifest_path):
+        return db_path, manifest_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_db = f"{db_path}.{os.getpid()}.tmp"
+    tmp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_db):
+        os.remove(tmp_db)
+    world = World(filename=tmp_db)
+    onto = ontomod.build_ontology(world)
+    rulesmod.attach_rules(onto)
+    books, inventories = loader.seed_catalog(onto, seed_path, default_threshold=default_threshold, default_restock=default_restock)
+    manifest = [[title, books[title].iri, inventories[title].iri] for title in books]
+    world.save()
+    world.close()
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    # Publish atomically; the manifest goes last since its presence marks a complete template
+    os.replace(tmp_db, db_path)
+    os.replace(tmp_manifest, manifest_path)
+    return db_path, manifest_path
+
+def clone_template(seed_path: str, cache_dir: str, default_threshold: int = 5, default_restock: int = 10) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+    """Return (onto, books, inventories) like build_ontology + attach_rules + loader.seed_catalog,
+    backed by a private in-memory copy of the cached template."""
+    db_path, manifest_path = ensure_template(seed_path, cache_dir, default_threshold, default_restock)
+    mem = sqlite3.connect(":memory:", check_same_thread=False)
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as src:
+        src.backup(mem)
+    # An existing filename tells Owlready2 not to initialize the schema; all I/O goes to `mem`
+    world = World(filename=db_path, connection=mem)
+    onto = world.get_ontology(ontomod.BASE_IRI)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    books = {title: world[book_iri] for title, book_iri, _ in manifest}
+    inventories = {title: world[inv_iri] for title, _, inv_iri in manifest}
+    return onto, books, inventories
@@ -5,8 +5,17 @@ from pydantic import BaseModel  # type: ignore[import-not-found]
 from typing import Optional, List, Dict, Any, Tuple
 from rdflib import Namespace, RDF, RDFS, Literal  # type: ignore[import-not-found]
 import asyncio
+import concurrent.futures
 import json
 import logging
+import math
+import threading
+import time
+
+try:
+    import orjson  # type: ignore[import-not-found]
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
 
 from models.ontology import GraphManager
 from models.hmm import HMMInference
@@ -33,9 +42,22 @@ simulation_model: Optional[SimulationModel] = None
 simulation_config: Optional[Dict[str, Any]] = None
 hmm_instance: Optional[HMMInference] = None
 simulation_running = False
-simulation_task: Optional[asyncio.Task] = None
+simulation_starting = False  # set while /simulation/start builds the model, so a second start is refused
 websocket_clients: List[WebSocket] = []
 
+# The model steps in a worker thread; each tick's payload is handed to the broadcaster task
+# through a bounded queue, so the simulation never runs more than TICK_QUEUE_SIZE ticks ahead
+# of the WebSocket fan-out and the event loop stays free for REST calls and pings.
+TICK_QUEUE_SIZE = 8
+simulation_thread: Optional[threading.Thread] = None
+simulation_stop = threading.Event()
+broadcast_task: Optional[asyncio.Task] = None
+last_tick: Optional[Dict[str, Any]] = None
+# Guards simulation_model and graph_manager: the worker thread mutates both while stepping
+model_lock = threading.Lock()
+# A client whose send of one tick takes longer than this is disconnected
+CLIENT_SEND_TIMEOUT = 2.0
+
 # ============ Models ============
 
 class OntologyLoadRequest(BaseModel):
@@ -61,18 +83,36 @@ class SimulationConfigRequest(BaseModel):
     gridHeight: int = 10
     hmm: Dict[str, Any]
     inventory: Optional[List[InventoryItem]] = None
+    tickRate: float = 2.0  # ticks per second while running; 0 = as fast as possible
 
 class OntologyUpdateRequest(BaseModel):
     # Each triple: (subject, predicate, object, is_add)
     triples: List[Tuple[str, str, str, bool]]
 
+def locked(fn, *args, **kwargs):
+    """Call fn holding model_lock (use via asyncio.to_thread, never on the event loop)."""
+    with model_lock:
+        return fn(*args, **kwargs)
+
+def tick_interval(config: Dict[str, Any]) -> float:
+    """Seconds per tick from config["tickRate"] (ticks per second, 0 or missing: as fast as
+    possible). Raises HTTPException 400 for a negative or non-numeric rate."""
+    try:
+        rate = float(config.get("tickRate") or 0.0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"tickRate must be a number, not {config.get('tickRate')!r}")
+    if not math.isfinite(rate) or rate < 0:
+        raise HTTPException(status_code=400, detail=f"tickRate must be a finite number >= 0, not {rate}")
+    return 1.0 / rate if rate > 0 else 0.0
+
 # ============ Ontology Endpoints ============
 
 @app.post("/ontology/load")
 async def load_ontology(request: OntologyLoadRequest):
     """Load ontology from path or string."""
     try:
-        result = graph_manager.load_graph(
+        result = await asyncio.to_thread(
+            locked, graph_manager.load_graph,
             path=request.path,
             ttl=request.ttl,
             owl=request.owl
@@ -85,20 +125,21 @@ async def load_ontology(request: OntologyLoadRequest):
 @app.get("/ontology/summary")
 async def ontology_summary():
     """Get ontology summary."""
-    return graph_manager.summary()
+    return await asyncio.to_thread(locked, graph_manager.summary)
 
 @app.get("/ontology/instances")
 async def get_instances(class_name: str):
     """Get instances of a class."""
-    instances = graph_manager.get_instances(class_name)
+    instances = await asyncio.to_thread(locked, graph_manager.get_instances, class_name)
     return {"class": class_name, "instances": instances}
 
 @app.post("/ontology/update")
 async def update_ontology(request: OntologyUpdateRequest):
     """Apply triple updates."""
     try:
-        result = graph_manager.apply_updates(request.triples)
-        diff = graph_manager.diff()
+        def apply():
+            return graph_manager.apply_updates(request.triples), graph_manager.diff()
+        result, diff = await asyncio.to_thread(locked, apply)
         return {"status": "success", "result": result, "diff": diff}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -106,7 +147,7 @@ async def update_ontology(request: OntologyUpdateRequest):
 @app.get("/ontology/diff")
 async def get_diff():
     """Get ontology diff since initial load."""
-    return graph_manager.diff()
+    return await asyncio.to_thread(locked, graph_manager.diff)
 
 # ============ Simulation Endpoints ============
 
@@ -116,6 +157,7 @@ async def set_simulation_config(config: SimulationConfigRequest):
     global simulation_config, hmm_instance
     
     try:
+        tick_interval(config.dict())  # reject a bad tickRate before anything is stored
         simulation_config = config.dict()
         
         # Initialize HMM
@@ -123,7 +165,7 @@ async def set_simulation_config(config: SimulationConfigRequest):
 
         # If inventory not provided explicitly, derive it from the loaded ontology
         if not simulation_config.get("inventory"):
-            derived_inventory = extract_inventory_from_ontology(graph_manager)
+            derived_inventory = await asyncio.to_thread(locked, extract_inventory_from_ontology, graph_manager)
             if derived_inventory:
                 simulation_config["inventory"] = derived_inventory
             else:
@@ -139,42 +181,61 @@ async def set_simulation_config(config: SimulationConfigRequest):
 @app.post("/simulation/start")
 async def start_simulation():
     """Start the simulation."""
-    global simulation_model, simulation_running, simulation_task
+    global simulation_model, simulation_running, simulation_starting, simulation_thread, broadcast_task, last_tick
     
     if not simulation_config or not hmm_instance:
         raise HTTPException(status_code=400, detail="Configuration not set")
     if not graph_manager.graph:
         raise HTTPException(status_code=400, detail="Ontology must be loaded before starting the simulation")
     
-    if simulation_running:
+    if simulation_running or simulation_starting:
         raise HTTPException(status_code=400, detail="Simulation already running")
+    interval = tick_interval(simulation_config)
     
+    # Claimed before the first await: a concurrent start sees it and is refused
+    simulation_starting = True
     try:
         # Create model
-        simulation_model = SimulationModel(simulation_config, graph_manager, hmm_instance)
+        simulation_model = await asyncio.to_thread(locked, SimulationModel, simulation_config, graph_manager, hmm_instance)
+        last_tick = None
         simulation_running = True
         
-        # Start simulation loop in background
-        simulation_task = asyncio.create_task(run_simulation())
+        # Step in a worker thread; ticks reach the clients through the broadcaster task
+        queue: asyncio.Queue = asyncio.Queue(maxsize=TICK_QUEUE_SIZE)
+        simulation_stop.clear()
+        broadcast_task = asyncio.create_task(broadcast_ticks(queue))
+        simulation_thread = threading.Thread(
+            target=run_simulation,
+            args=(simulation_model, int(simulation_config.get("ticks", 100)), interval, asyncio.get_running_loop(), queue),
+            name="simulation", daemon=True)
+        simulation_thread.start()
         
         return {"status": "success", "message": "Simulation started"}
     except Exception as e:
+        simulation_running = False
         logger.error(f"Failed to start simulation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        simulation_starting = False
 
 @app.post("/simulation/stop")
 async def stop_simulation():
     """Stop the simulation."""
-    global simulation_running, simulation_task
+    global simulation_running, simulation_thread, broadcast_task
     
     simulation_running = False
+    simulation_stop.set()
     
-    if simulation_task:
-        simulation_task.cancel()
+    if simulation_thread:
+        await asyncio.to_thread(simulation_thread.join)
+        simulation_thread = None
+    if broadcast_task:
+        broadcast_task.cancel()
         try:
-            await simulation_task
+            await broadcast_task
         except asyncio.CancelledError:
             pass
+        broadcast_task = None
     
     return {"status": "success", "message": "Simulation stopped"}
 
@@ -184,22 +245,25 @@ async def step_simulation():
     if not simulation_model:
         raise HTTPException(status_code=400, detail="Simulation not initialized")
     
-    simulation_model.step()
+    payload = await asyncio.to_thread(step_once, simulation_model)
     
     # Broadcast tick
-    await broadcast_tick()
+    await broadcast_payload(payload)
     
-    return {"status": "success", "tick": simulation_model.current_tick}
+    return {"status": "success", "tick": payload["tick"]}
 
 @app.get("/simulation/metrics")
 async def get_metrics():
     """Get cumulative metrics."""
     if not simulation_model:
         return {"metrics": {}}
+    if last_tick is None:
+        return {"metrics": dict(simulation_model.metrics), "tick": simulation_model.current_tick}
     
+    # Last published tick: the model itself may be mid-step in the worker thread
     return {
-        "metrics": simulation_model.metrics,
-        "tick": simulation_model.current_tick
+        "metrics": last_tick["metrics"],
+        "tick": last_tick["tick"]
     }
 
 @app.get("/simulation/logs")
@@ -213,7 +277,7 @@ async def get_status():
     """Get simulation status."""
     return {
         "running": simulation_running,
-        "tick": simulation_model.current_tick if simulation_model else 0,
+        "tick": last_tick["tick"] if last_tick else (simulation_model.current_tick if simulation_model else 0),
         "configured": simulation_config is not None
     }
 
@@ -235,69 +299,127 @@ async def websocket_endpoint(websocket: WebSocket):
             if data == "ping":
                 await websocket.send_text("pong")
     except WebSocketDisconnect:
-        websocket_clients.remove(websocket)
+        if websocket in websocket_clients:
+            websocket_clients.remove(websocket)
         logger.info(f"WebSocket client disconnected. Total: {len(websocket_clients)}")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         if websocket in websocket_clients:
             websocket_clients.remove(websocket)
 
-async def broadcast_tick():
-    """Broadcast current tick state to all WebSocket clients."""
-    if not simulation_model:
-        return
-    
-    payload = {
-        "tick": simulation_model.current_tick,
-        "events": simulation_model.events,
-        "grid": simulation_model.get_grid_state(),
-        "metrics": simulation_model.metrics,
-        "customerStates": simulation_model.get_customer_states(),
-        "inventory": simulation_model.get_inventory_snapshot()
+def snapshot_tick(model: SimulationModel) -> Dict[str, Any]:
+    """Build the tick payload (call with model_lock held; the result no longer aliases the model)."""
+    return {
+        "tick": model.current_tick,
+        "events": list(model.events),
+        "grid": model.get_grid_state(),
+        "metrics": dict(model.metrics),
+        "customerStates": model.get_customer_states(),
+        "inventory": model.get_inventory_snapshot()
     }
+
+def step_once(model: SimulationModel) -> Dict[str, Any]:
+    """Advance the model one tick and return its payload (runs off the event loop)."""
+    global last_tick
+    with model_lock:
+        model.step()
+        payload = snapshot_tick(model)
+    last_tick = payload
+    return payload
+
+def encode_payload(payload: Dict[str, Any]) -> str:
+    """JSON-encode a tick payload once for every client (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(payload, separators=(",", ":"))
+
+async def send_to_client(client: WebSocket, text: str) -> bool:
+    """Send one encoded tick; False if the client failed or stalled past CLIENT_SEND_TIMEOUT."""
+    try:
+        await asyncio.wait_for(client.send_text(text), CLIENT_SEND_TIMEOUT)
+        return True
+    except asyncio.TimeoutError:
+        logger.warning(f"Client stalled for more than {CLIENT_SEND_TIMEOUT}s; disconnecting it")
+    except Exception as e:
+        logger.error(f"Failed to send to client: {e}")
+    return False
+
+async def close_client(client: WebSocket):
+    try:
+        await asyncio.wait_for(client.close(code=1013), CLIENT_SEND_TIMEOUT)  # 1013: try again later
+    except Exception:
+        pass
+
+async def broadcast_payload(payload: Dict[str, Any]):
+    """Broadcast one tick payload to all WebSocket clients: encoded once, sent concurrently."""
+    clients = list(websocket_clients)
+    if not clients:
+        return
+    text = encode_payload(payload)
+    sent = await asyncio.gather(*(send_to_client(client, text) for client in clients))
     
-    # Send to all connected clients
-    disconnected = []
-    for client in websocket_clients:
-        try:
-            await client.send_json(payload)
-        except Exception as e:
-            logger.error(f"Failed to send to client: {e}")
-            disconnected.append(client)
-    
-    # Clean up disconnected clients
-    for client in disconnected:
-        if client in websocket_clients:
+    # Drop failed and stalled clients (a timed-out send may have left a partial frame behind)
+    for client, ok in zip(clients, sent):
+        if not ok and client in websocket_clients:
             websocket_clients.remove(client)
-
-async def run_simulation():
-    """Run simulation loop."""
+            asyncio.create_task(close_client(client))
+
+async def broadcast_ticks(queue: asyncio.Queue):
+    """Forward tick payloads from the simulation thread to the clients until the None sentinel."""
+    while True:
+        payload = await queue.get()
+        if payload is None:
+            break
+        await broadcast_payload(payload)
+
+def run_simulation(model: SimulationModel, max_ticks: int, tick_interval: float,
+                   loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+    """Simulation loop (worker thread). tick_interval is the target seconds per tick, 0 for as
+    fast as possible; a tick that overruns it starts the next one immediately."""
     global simulation_running
     
-    # Defensive guards for type checker and runtime
-    if simulation_config is None or simulation_model is None:
-        logger.warning("Simulation config or model missing; aborting run loop")
-        return
-    max_ticks = int(simulation_config.get("ticks", 100))
+    def hand_over(payload: Optional[Dict[str, Any]]) -> bool:
+        # Blocks while the queue is full (broadcaster behind); gives up on stop or loop shutdown
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(payload), loop)
+        except RuntimeError:
+            return False
+        while True:
+            try:
+                future.result(timeout=0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if simulation_stop.is_set() or loop.is_closed():
+                    future.cancel()
+                    return False
     
     try:
-        while simulation_running and simulation_model.current_tick < max_ticks:
-            simulation_model.step()
-            
-            # Broadcast tick
-            await broadcast_tick()
+        next_due = time.monotonic()
+        while not simulation_stop.is_set() and model.current_tick < max_ticks:
+            if not hand_over(step_once(model)):
+                break
             
-            # Delay between ticks
-            await asyncio.sleep(0.5)
+            # Delay between ticks (interruptible by stop)
+            if tick_interval > 0:
+                next_due += tick_interval
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    simulation_stop.wait(delay)
+                else:
+                    next_due = time.monotonic()
         
-        simulation_running = False
-        logger.info("Simulation completed")
-    except asyncio.CancelledError:
-        logger.info("Simulation cancelled")
-        simulation_running = False
+        if not simulation_stop.is_set():
+            logger.info("Simulation completed")
+        else:
+            logger.info("Simulation cancelled")
     except Exception as e:
         logger.error(f"Simulation error: {e}")
+    finally:
         simulation_running = False
+        try:
+            asyncio.run_coroutine_threadsafe(queue.put(None), loop)  # ends broadcast_ticks once it catches up
+        except RuntimeError:
+            pass  # event loop already closed
 
 @app.get("/")
 async def root():